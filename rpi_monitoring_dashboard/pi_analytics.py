@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+"""
+Raspberry Pi 5 Monitoring - History Analytics
+
+Computes, from the daily CSV reports written by pi_monitor.py:
+1. Uptime percentages (system, APC, RTSP recorder, internet)
+2. Collection gaps longer than the expected sampling interval
+3. Incident intervals (service down, internet down, high and critical
+   temperature/RAM/disk), each opened by a transition from a good sample
+4. Percentile summaries for CPU, RAM, disk and temperature
+
+History is loaded column-wise into NumPy arrays and every analysis step is a
+vectorized operation. Parsed days are cached as .npy files in
+analytics_cache/ next to the reports, so only days whose CSV changed are
+re-parsed. The result is written to analytics.json in the metrics directory;
+the dashboard uses its uptime and incidents for the default (last 30 days)
+view (uptime, events and gaps) instead of walking every row in the browser.
+
+It is run by pi_monitor.py after each cycle, or by hand:
+    pi_analytics.py --days 90
+"""
+
+import os
+import csv
+import sys
+import json
+import time
+import logging
+import argparse
+from datetime import datetime, timedelta
+
+logger = logging.getLogger('pi_monitor.analytics')
+
+# NumPy is required for the analytics, provide installation instructions if missing
+try:
+    import numpy as np
+except ImportError:
+    np = None
+    logger.error("numpy module not found. Please install it using: sudo apt install python3-numpy")
+
+# Default location of the metrics written by pi_monitor.py
+DEFAULT_DATA_DIR = '/var/www/camera-dashboard/metrics'
+ANALYTICS_FILE_NAME = 'analytics.json'
+CACHE_DIR_NAME = 'analytics_cache'
+
+# Expected data collection interval in minutes (matches EXPECTED_INTERVAL_MINUTES in script.js)
+EXPECTED_INTERVAL_MINUTES = 1
+
+# A gap is reported when two samples are further apart than this many intervals
+GAP_TOLERANCE_INTERVALS = 1.5
+
+# Thresholds for incidents (same as the *_HIGH and *_CRITICAL THRESHOLDS in script.js)
+THRESHOLDS = {
+    'temperature_c': 80,
+    'ram_percent': 80,
+    'disk_percent': 85,
+}
+CRITICAL_THRESHOLDS = {
+    'temperature_c': 85,
+    'ram_percent': 95,
+    'disk_percent': 95,
+}
+
+PERCENTILES = [50, 90, 95, 99]
+
+NUMERIC_COLUMNS = ['cpu_percent', 'disk_percent', 'ram_percent', 'temperature_c', 'pending_videos']
+STATUS_COLUMNS = ['apc_status', 'rtsp_recorder_status', 'internet_status']
+
+# Status columns are dictionary-encoded as int8 codes into this list
+STATUS_VALUES = ['unknown', 'running', 'stopped', 'timeout', 'error', 'not_available', 'connected', 'disconnected']
+STATUS_CODES = {value: code for code, value in enumerate(STATUS_VALUES)}
+
+# Status column -> value that counts as "up"
+UP_VALUES = {
+    'apc_status': 'running',
+    'rtsp_recorder_status': 'running',
+    'internet_status': 'connected',
+}
+
+# Row layout of the per-day cache files
+CACHE_DTYPE = [('timestamp', 'f8')] + [(name, 'f4') for name in NUMERIC_COLUMNS] + [(name, 'i1') for name in STATUS_COLUMNS]
+
+
+def _to_float_array(values):
+    """Convert a column of CSV strings to float64, using NaN for missing or -1 values"""
+    try:
+        arr = np.array(values, dtype=np.float64)
+    except ValueError:
+        # Some cells are empty or malformed, convert them one at a time
+        arr = np.empty(len(values), dtype=np.float64)
+        for i, value in enumerate(values):
+            try:
+                arr[i] = float(value)
+            except ValueError:
+                arr[i] = np.nan
+    # pi_monitor.py writes -1 when a metric could not be collected
+    arr[arr == -1] = np.nan
+    return arr
+
+
+def _to_epoch_array(values):
+    """Convert a column of ISO timestamps to float64 seconds, using NaN for bad values
+
+    Timestamps are local wall-clock times; they are kept naive throughout so
+    that reported times match the CSV files.
+    """
+    try:
+        stamps = np.array(values, dtype='datetime64[us]')
+    except ValueError:
+        stamps = np.empty(len(values), dtype='datetime64[us]')
+        for i, value in enumerate(values):
+            try:
+                stamps[i] = np.datetime64(value, 'us')
+            except ValueError:
+                stamps[i] = np.datetime64('NaT')
+    seconds = stamps.astype('int64') / 1e6
+    seconds[np.isnat(stamps)] = np.nan
+    return seconds
+
+
+def _to_status_codes(values):
+    """Dictionary-encode a column of status strings, unknown values map to 'unknown'"""
+    uniques, inverse = np.unique(np.asarray(values), return_inverse=True)
+    lookup = np.array([STATUS_CODES.get(value, 0) for value in uniques.tolist()], dtype=np.int8)
+    return lookup[inverse]
+
+
+def _to_iso(seconds):
+    """Format an array of epoch seconds as ISO timestamps"""
+    stamps = (np.asarray(seconds) * 1e6).astype('int64').astype('datetime64[us]')
+    return np.datetime_as_string(stamps, unit='s').tolist()
+
+
+def empty_columns():
+    """Columns for a history with no samples"""
+    return {name: np.empty(0, dtype=dtype) for name, dtype in CACHE_DTYPE}
+
+
+def parse_report(path):
+    """Parse one CSV report into a dict of NumPy columns"""
+    with open(path, newline='') as f:
+        rows = list(csv.reader(f))
+
+    columns = empty_columns()
+    if len(rows) < 2:
+        return columns
+
+    header = rows[0]
+    width = len(header)
+    # Drop truncated rows (e.g. a partial line from a power cut during a write)
+    body = [row for row in rows[1:] if len(row) == width]
+    if not body or 'timestamp' not in header:
+        return columns
+
+    raw = dict(zip(header, zip(*body)))
+
+    columns['timestamp'] = _to_epoch_array(raw['timestamp'])
+    for name in NUMERIC_COLUMNS:
+        if name in raw:
+            columns[name] = _to_float_array(raw[name])
+        else:
+            columns[name] = np.full(len(body), np.nan)
+    for name in STATUS_COLUMNS:
+        if name in raw:
+            columns[name] = _to_status_codes(raw[name])
+        else:
+            columns[name] = np.zeros(len(body), dtype=np.int8)
+
+    # Drop rows without a usable timestamp
+    valid = ~np.isnan(columns['timestamp'])
+    if not valid.all():
+        columns = {name: col[valid] for name, col in columns.items()}
+
+    return columns
+
+
+class ReportCache:
+    """Per-day cache of parsed reports
+
+    Each report is stored as a single structured .npy array, and index.json
+    records the size and mtime of the CSV it was built from. Only reports that
+    changed since the last run (normally just today's) are parsed again.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.index_file = os.path.join(cache_dir, 'index.json')
+        self.dirty = False
+        try:
+            with open(self.index_file) as f:
+                self.index = json.load(f)
+        except (OSError, ValueError):
+            self.index = {}
+
+    def load(self, path):
+        """Return the columns for a report, parsing it only if it changed"""
+        stat = os.stat(path)
+        name = os.path.splitext(os.path.basename(path))[0]
+        cache_file = os.path.join(self.cache_dir, name + '.npy')
+
+        if self.index.get(name) == [stat.st_size, stat.st_mtime]:
+            try:
+                records = np.load(cache_file)
+                return {column: records[column] for column, _ in CACHE_DTYPE}
+            except (OSError, ValueError):
+                # Missing or unreadable cache, parse the CSV instead
+                pass
+
+        columns = parse_report(path)
+        records = np.empty(len(columns['timestamp']), dtype=CACHE_DTYPE)
+        for column, _ in CACHE_DTYPE:
+            records[column] = columns[column]
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            np.save(cache_file, records)
+            self.index[name] = [stat.st_size, stat.st_mtime]
+            self.dirty = True
+        except Exception as e:
+            logger.debug(f"Could not write analytics cache {cache_file}: {str(e)}")
+
+        return columns
+
+    def save(self):
+        """Write the index back if any report was re-parsed"""
+        if not self.dirty:
+            return
+        try:
+            with open(self.index_file, 'w') as f:
+                json.dump(self.index, f)
+            self.dirty = False
+        except Exception as e:
+            logger.debug(f"Could not write analytics cache index: {str(e)}")
+
+
+def load_history(data_dir, start_date, end_date, use_cache=True):
+    """Load the daily reports between start_date and end_date (inclusive) as one set of columns"""
+    reports_dir = os.path.join(data_dir, 'reports')
+    cache = ReportCache(os.path.join(data_dir, CACHE_DIR_NAME)) if use_cache else None
+
+    parts = []
+    day = start_date
+    while day <= end_date:
+        path = os.path.join(reports_dir, f"report_{day.isoformat()}.csv")
+        if os.path.isfile(path):
+            try:
+                parts.append(cache.load(path) if cache else parse_report(path))
+            except Exception as e:
+                logger.error(f"Failed to load report {path}: {str(e)}")
+        day += timedelta(days=1)
+
+    if cache:
+        cache.save()
+
+    if not parts:
+        return empty_columns()
+
+    columns = {name: np.concatenate([part[name] for part in parts]) for name, _ in CACHE_DTYPE}
+
+    # Reports are appended in time order, but sort anyway in case the clock jumped
+    timestamps = columns['timestamp']
+    if np.any(timestamps[1:] < timestamps[:-1]):
+        order = np.argsort(timestamps, kind='stable')
+        columns = {name: col[order] for name, col in columns.items()}
+
+    return columns
+
+
+def _runs(mask):
+    """Return (start, end) index pairs for each run of True values in mask"""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)  # index of the first sample after the run
+    return starts, ends
+
+
+def find_incidents(timestamps, mask, name):
+    """Build incident records for each run of bad samples in mask
+
+    Like the dashboard's event analysis, an incident needs a good sample
+    before it: a run already in progress at the first sample is marked
+    open_at_start (only its end is an event) and is not counted.
+    """
+    if not mask.any():
+        return []
+
+    starts, ends = _runs(mask)
+    last = len(timestamps) - 1
+    # An incident ends at the first good sample, or at the last sample if still ongoing
+    end_times = timestamps[np.minimum(ends, last)]
+    ongoing = ends > last
+
+    durations = np.round((end_times - timestamps[starts]) / 60, 1)
+
+    return [
+        {
+            'type': name,
+            'start': start,
+            'end': None if is_ongoing else end,
+            'duration_minutes': duration,
+            'samples': count,
+            'open_at_start': open_at_start,
+        }
+        for start, end, is_ongoing, duration, count, open_at_start in zip(
+            _to_iso(timestamps[starts]), _to_iso(end_times), ongoing.tolist(), durations.tolist(), (ends - starts).tolist(),
+            (starts == 0).tolist()
+        )
+    ]
+
+
+def find_gaps(timestamps, interval_minutes=EXPECTED_INTERVAL_MINUTES):
+    """Find periods with no samples longer than the expected interval"""
+    if len(timestamps) < 2:
+        return []
+
+    interval = interval_minutes * 60
+    deltas = np.diff(timestamps)
+    gap_idx = np.flatnonzero(deltas > interval * GAP_TOLERANCE_INTERVALS)
+    gap_lengths = deltas[gap_idx]
+
+    return [
+        {
+            'start': start,
+            'end': end,
+            'duration_minutes': duration,
+            'missed_samples': missed,
+        }
+        for start, end, duration, missed in zip(
+            _to_iso(timestamps[gap_idx]),
+            _to_iso(timestamps[gap_idx + 1]),
+            np.round(gap_lengths / 60, 1).tolist(),
+            (np.round(gap_lengths / interval).astype(np.int64) - 1).tolist(),
+        )
+    ]
+
+
+def compute_uptime(columns, interval_minutes=EXPECTED_INTERVAL_MINUTES):
+    """Compute uptime percentages over expected collection slots"""
+    timestamps = columns['timestamp']
+    if len(timestamps) == 0:
+        return {}
+
+    interval = interval_minutes * 60
+    slots = np.floor(timestamps / interval).astype(np.int64)
+    expected_slots = int(slots[-1] - slots[0]) + 1
+
+    # The system counts as up for every slot that has at least one sample
+    unique_slots, last_in_slot = np.unique(slots[::-1], return_index=True)
+    # Index of the latest sample in each slot (same as the dashboard's lookup map)
+    last_in_slot = len(slots) - 1 - last_in_slot
+
+    uptime = {
+        'system': round(len(unique_slots) / expected_slots * 100, 2),
+    }
+    for name, up_value in UP_VALUES.items():
+        up_slots = np.count_nonzero(columns[name][last_in_slot] == STATUS_CODES[up_value])
+        uptime[name.replace('_status', '')] = round(int(up_slots) / expected_slots * 100, 2)
+
+    return uptime
+
+
+def summarise_metric(values):
+    """Min/max/mean and percentiles of a numeric column, ignoring missing values"""
+    present = values[~np.isnan(values)]
+    if len(present) == 0:
+        return None
+
+    summary = {
+        'min': round(float(present.min()), 2),
+        'max': round(float(present.max()), 2),
+        'mean': round(float(present.mean()), 2),
+    }
+    for pct, value in zip(PERCENTILES, np.percentile(present, PERCENTILES).tolist()):
+        summary[f"p{pct}"] = round(value, 2)
+    return summary
+
+
+def analyse(columns, interval_minutes=EXPECTED_INTERVAL_MINUTES):
+    """Run all analyses over a set of history columns"""
+    timestamps = columns['timestamp']
+    if len(timestamps) == 0:
+        return {'records': 0}
+
+    incidents = []
+    for name, up_value in UP_VALUES.items():
+        incidents.extend(find_incidents(timestamps, columns[name] != STATUS_CODES[up_value], name.replace('_status', '') + '_down'))
+    for name, threshold in THRESHOLDS.items():
+        # NaN compares as False, so missing samples never open an incident
+        incidents.extend(find_incidents(timestamps, columns[name] >= threshold, name + '_high'))
+        incidents.extend(find_incidents(timestamps, columns[name] >= CRITICAL_THRESHOLDS[name], name + '_critical'))
+    incidents.sort(key=lambda incident: incident['start'])
+
+    counts = {}
+    for incident in incidents:
+        if incident['open_at_start']:
+            continue
+        counts[incident['type']] = counts.get(incident['type'], 0) + 1
+
+    return {
+        'records': int(len(timestamps)),
+        'start': _to_iso(timestamps[0]),
+        'end': _to_iso(timestamps[-1]),
+        'total_hours': round(float(timestamps[-1] - timestamps[0]) / 3600, 2),
+        'incident_counts': counts,
+        'uptime_percent': compute_uptime(columns, interval_minutes),
+        'gaps': find_gaps(timestamps, interval_minutes),
+        'incidents': incidents,
+        'metrics': {name: summarise_metric(columns[name]) for name in NUMERIC_COLUMNS},
+    }
+
+
+def analyse_history(data_dir=DEFAULT_DATA_DIR, days=30, end_date=None, use_cache=True):
+    """Load and analyse the last `days` days of reports ending at end_date (default today)"""
+    end_date = end_date or datetime.now().date()
+    start_date = end_date - timedelta(days=days - 1)
+
+    started = time.perf_counter()
+    columns = load_history(data_dir, start_date, end_date, use_cache)
+    result = analyse(columns)
+    result['generated_at'] = datetime.now().isoformat()
+    result['range'] = {'start_date': start_date.isoformat(), 'end_date': end_date.isoformat(), 'days': days}
+    result['analysis_seconds'] = round(time.perf_counter() - started, 4)
+    return result
+
+
+def write_analytics(data_dir=DEFAULT_DATA_DIR, days=30):
+    """Analyse recent history and publish it as analytics.json in the metrics directory"""
+    result = analyse_history(data_dir, days)
+    output_file = os.path.join(data_dir, ANALYTICS_FILE_NAME)
+    tmp_file = output_file + '.tmp'
+    with open(tmp_file, 'w') as f:
+        json.dump(result, f, indent=2)
+    # Replace atomically so the dashboard never reads a half-written file
+    os.replace(tmp_file, output_file)
+    return result
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='Analyse Raspberry Pi monitoring history')
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help='metrics directory written by pi_monitor.py')
+    parser.add_argument('--days', type=int, default=30, help='number of days to analyse, ending today')
+    parser.add_argument('--no-cache', action='store_true', help='re-parse every CSV report')
+    parser.add_argument('--write', action='store_true', help=f'publish the result to {ANALYTICS_FILE_NAME}')
+    args = parser.parse_args()
+
+    if np is None:
+        print("ERROR: numpy module not found. Please install it using: sudo apt install python3-numpy", file=sys.stderr)
+        sys.exit(1)
+
+    if args.write:
+        result = write_analytics(args.data_dir, args.days)
+    else:
+        result = analyse_history(args.data_dir, args.days, use_cache=not args.no_cache)
+    print(json.dumps(result, indent=2))
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Raspberry Pi 5 Monitoring - Columnar history export
+
+Converts the CSV history written by pi_monitor.py into typed Arrow record
+batches and Parquet files for fleet-wide analysis:
+1. Timestamps are real timestamps, not strings
+2. The -1 and "unknown" (eth0_ip) "not collected" markers and empty/None
+   cells become nulls
+3. Status columns are dictionary-encoded
+4. Readers stream record batches and skip data outside a time range
+   (daily reports by file name, Parquet row groups by their statistics)
+
+Usage:
+    pi_export.py export --output /tmp/history.parquet --start 2026-01-01
+    pi_export.py read /tmp/history.parquet --start 2026-03-01 --end 2026-03-31
+
+Requires pyarrow (sudo apt install python3-pyarrow, or pip3 install pyarrow).
+"""
+
+import os
+import sys
+import glob
+import logging
+import argparse
+from datetime import datetime, date, timedelta
+
+logger = logging.getLogger('pi_monitor.export')
+
+# pyarrow is required for the export, provide installation instructions if missing
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    logger.error("pyarrow module not found. Please install it using: sudo pip3 install pyarrow")
+
+DEFAULT_DATA_DIR = '/var/www/camera-dashboard/metrics'
+
+# Columns whose sentinel values become nulls (column types are in history_schema())
+SENTINEL_COLUMNS = ['cpu_percent', 'disk_percent', 'ram_percent', 'temperature_c']  # -1 means "not collected"
+UNKNOWN_COLUMNS = ['eth0_ip']  # "unknown" means "not collected"; in status columns it is a real status
+
+# Row group size when exporting; one group per daily report is also a natural time partition
+ROW_GROUP_SIZE = 64 * 1024
+BATCH_SIZE = 64 * 1024
+
+
+def history_schema():
+    """Arrow schema of the exported history"""
+    status_type = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        ('timestamp', pa.timestamp('us')),
+        ('apc_status', status_type),
+        ('rtsp_recorder_status', status_type),
+        ('eth0_status', status_type),
+        ('eth0_ip', pa.string()),
+        ('root_mount_mode', status_type),
+        ('cpu_percent', pa.float32()),
+        ('pending_videos', pa.int32()),
+        ('oldest_video', pa.timestamp('us')),
+        ('newest_video', pa.timestamp('us')),
+        ('disk_percent', pa.float32()),
+        ('ram_percent', pa.float32()),
+        ('temperature_c', pa.float32()),
+        ('internet_status', status_type),
+    ])
+
+
+def _to_datetime(value, end=False):
+    """Parse a --start/--end value: a date (whole day) or a full ISO timestamp"""
+    if value is None or isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        value = value.isoformat()
+    parsed = datetime.fromisoformat(value)
+    if end and len(value) == 10:
+        # A bare end date includes the whole day
+        parsed += timedelta(days=1)
+    return parsed
+
+
+def _clean_batch(batch, schema):
+    """Replace -1 and "unknown" sentinels with nulls and align the batch to the schema"""
+    columns = []
+    for field in schema:
+        column = batch.column(batch.schema.get_field_index(field.name))
+        if field.name in SENTINEL_COLUMNS:
+            column = pc.if_else(pc.equal(column, -1), pa.scalar(None, field.type), column)
+        elif field.name in UNKNOWN_COLUMNS:
+            column = pc.if_else(pc.equal(column, 'unknown'), pa.scalar(None, field.type), column)
+        columns.append(column)
+    return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+
+def _time_mask(batch, start, end):
+    mask = None
+    timestamps = batch.column(0)
+    if start is not None:
+        mask = pc.greater_equal(timestamps, pa.scalar(start, pa.timestamp('us')))
+    if end is not None:
+        below = pc.less(timestamps, pa.scalar(end, pa.timestamp('us')))
+        mask = below if mask is None else pc.and_(mask, below)
+    return mask
+
+
+def read_csv_batches(path, start=None, end=None, batch_size=BATCH_SIZE):
+    """Stream one history CSV as typed record batches, keeping rows in [start, end)"""
+    schema = history_schema()
+    convert_options = pa_csv.ConvertOptions(
+        column_types={field.name: field.type for field in schema},
+        include_columns=schema.names,
+        include_missing_columns=True,  # Older or newer files may lack some columns
+        null_values=['', 'None'],
+        strings_can_be_null=True,
+    )
+    # Skip truncated lines (e.g. a power cut during a write) instead of failing the file
+    parse_options = pa_csv.ParseOptions(invalid_row_handler=lambda row: 'skip')
+    read_options = pa_csv.ReadOptions(block_size=batch_size * 128)
+
+    reader = pa_csv.open_csv(path, read_options=read_options, parse_options=parse_options,
+                             convert_options=convert_options)
+    for batch in reader:
+        batch = _clean_batch(batch, schema)
+        mask = _time_mask(batch, start, end)
+        if mask is not None:
+            batch = batch.filter(mask)
+        if batch.num_rows:
+            yield batch
+
+
+def report_files(data_dir, start=None, end=None):
+    """Daily reports overlapping [start, end), selected by the date in the file name"""
+    paths = []
+    for path in sorted(glob.glob(os.path.join(data_dir, 'reports', 'report_*.csv'))):
+        try:
+            day = datetime.strptime(os.path.basename(path)[len('report_'):-len('.csv')], '%Y-%m-%d')
+        except ValueError:
+            continue
+        if start is not None and day + timedelta(days=1) <= start:
+            continue
+        if end is not None and day >= end:
+            continue
+        paths.append(path)
+    return paths
+
+
+def read_history_batches(data_dir=DEFAULT_DATA_DIR, start=None, end=None, batch_size=BATCH_SIZE):
+    """Stream the whole history of a Pi as typed record batches
+
+    Uses the daily reports when present, so days outside the range are never
+    opened; falls back to all_metrics_history.csv otherwise.
+    """
+    start, end = _to_datetime(start), _to_datetime(end, end=True)
+    paths = report_files(data_dir, start, end)
+    if not paths:
+        history_file = os.path.join(data_dir, 'all_metrics_history.csv')
+        paths = [history_file] if os.path.isfile(history_file) else []
+
+    for path in paths:
+        try:
+            for batch in read_csv_batches(path, start, end, batch_size):
+                yield batch
+        except (pa.ArrowInvalid, OSError) as e:
+            logger.error(f"Skipping {path}: {str(e)}")
+
+
+def export_parquet(output_file, data_dir=DEFAULT_DATA_DIR, start=None, end=None, compression='zstd'):
+    """Write the history to a Parquet file, returning the number of rows written"""
+    rows = 0
+    tmp_file = output_file + '.tmp'
+    with pq.ParquetWriter(tmp_file, history_schema(), compression=compression) as writer:
+        for batch in read_history_batches(data_dir, start, end):
+            writer.write_batch(batch, row_group_size=ROW_GROUP_SIZE)
+            rows += batch.num_rows
+    os.replace(tmp_file, output_file)
+    return rows
+
+
+def read_parquet_batches(paths, start=None, end=None, columns=None, batch_size=BATCH_SIZE):
+    """Stream record batches from exported Parquet files (a file, directory or list of them)
+
+    The time range is pushed down to the Parquet reader, so row groups whose
+    timestamp statistics fall outside it are not read.
+    """
+    start, end = _to_datetime(start), _to_datetime(end, end=True)
+    dataset = ds.dataset(paths, format='parquet', schema=history_schema())
+
+    condition = None
+    if start is not None:
+        condition = ds.field('timestamp') >= pa.scalar(start, pa.timestamp('us'))
+    if end is not None:
+        upper = ds.field('timestamp') < pa.scalar(end, pa.timestamp('us'))
+        condition = upper if condition is None else condition & upper
+
+    for batch in dataset.to_batches(columns=columns, filter=condition, batch_size=batch_size):
+        if batch.num_rows:
+            yield batch
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='Export Raspberry Pi monitoring history to Parquet')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = commands.add_parser('export', help='write the CSV history to a Parquet file')
+    export_parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help='metrics directory written by pi_monitor.py')
+    export_parser.add_argument('--output', required=True, help='Parquet file to write')
+
+    read_parser = commands.add_parser('read', help='stream an exported file and print a summary')
+    read_parser.add_argument('paths', nargs='+', help='Parquet files or directories')
+    read_parser.add_argument('--columns', help='comma-separated columns to read')
+
+    for sub in (export_parser, read_parser):
+        sub.add_argument('--start', help='first date or timestamp to include')
+        sub.add_argument('--end', help='last date (inclusive) or timestamp (exclusive) to include')
+    args = parser.parse_args()
+
+    if pa is None:
+        print("ERROR: pyarrow module not found. Please install it using: sudo pip3 install pyarrow", file=sys.stderr)
+        sys.exit(1)
+
+    if args.command == 'export':
+        rows = export_parquet(args.output, args.data_dir, args.start, args.end)
+        print(f"Exported {rows} rows to {args.output}")
+    else:
+        columns = args.columns.split(',') if args.columns else None
+        rows = batches = 0
+        first = last = None
+        for batch in read_parquet_batches(args.paths, args.start, args.end, columns):
+            rows += batch.num_rows
+            batches += 1
+            if 'timestamp' in batch.schema.names:
+                stamps = batch.column('timestamp')
+                low, high = pc.min(stamps).as_py(), pc.max(stamps).as_py()
+                first = low if first is None or low < first else first
+                last = high if last is None or high > last else last
+        print(f"Read {rows} rows in {batches} batches" + (f" from {first} to {last}" if first else ''))
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Raspberry Pi 5 Monitoring - In-memory recent history
+
+Keeps the last few hours of samples from the resident monitor in a fixed-size
+ring buffer so recent-history views never touch the disk:
+1. Each metric is a preallocated array('d') column, statuses are array('b')
+   codes, so memory is fixed at startup (see RingBuffer.nbytes)
+2. Time ranges are located by binary search over the ring
+3. min/max/avg over any range come from per-metric segment trees, so range,
+   aggregate and sparkline queries are O(log n) per bucket
+
+The daemon exposes the buffer on a local HTTP port (proxied by nginx at
+/recent/), for example:
+    /recent/stats?metric=cpu_percent&minutes=60
+    /recent/sparkline?metric=temperature_c&minutes=360&points=120
+    /recent/series?minutes=30
+    /recent/latest
+"""
+
+import os
+import csv
+import json
+import math
+import time
+import logging
+import threading
+from array import array
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger('pi_monitor.history')
+
+# The buffer holds this many hours of samples; by default the monitor samples once a minute
+RECENT_HISTORY_HOURS = 24
+SAMPLE_INTERVAL_SECONDS = 60
+RECENT_HISTORY_MAX_SAMPLES = 10000  # About 6 MB, reached below a 9 second interval
+
+QUERY_HOST = '127.0.0.1'
+QUERY_PORT = 8787
+
+# Numeric columns of a saved row kept in the buffer
+METRIC_FIELDS = ['cpu_percent', 'ram_percent', 'disk_percent', 'temperature_c', 'pending_videos']
+
+# Status columns of a saved row, stored as int8 codes into STATUS_VALUES
+STATUS_FIELDS = ['apc_status', 'rtsp_recorder_status', 'eth0_status', 'root_mount_mode', 'internet_status']
+STATUS_VALUES = ['unknown', 'running', 'stopped', 'timeout', 'error', 'not_available',
+                 'connected', 'disconnected', 'up', 'down', 'ro', 'rw']
+STATUS_CODES = {value: code for code, value in enumerate(STATUS_VALUES)}
+
+NAN = float('nan')
+INF = float('inf')
+
+
+class AggregateTree:
+    """Segment tree of min, max, sum and count over a fixed number of slots
+
+    Missing values (NaN) are neutral: they do not affect any aggregate.
+    """
+
+    def __init__(self, capacity):
+        size = 1
+        while size < capacity:
+            size *= 2
+        self.size = size
+        self.mins = array('d', [INF]) * (2 * size)
+        self.maxs = array('d', [-INF]) * (2 * size)
+        self.sums = array('d', [0.0]) * (2 * size)
+        self.counts = array('l', [0]) * (2 * size)
+
+    def update(self, slot, value):
+        i = slot + self.size
+        if value != value:  # NaN
+            self.mins[i], self.maxs[i], self.sums[i], self.counts[i] = INF, -INF, 0.0, 0
+        else:
+            self.mins[i], self.maxs[i], self.sums[i], self.counts[i] = value, value, value, 1
+
+        mins, maxs, sums, counts = self.mins, self.maxs, self.sums, self.counts
+        i //= 2
+        while i:
+            left, right = 2 * i, 2 * i + 1
+            mins[i] = mins[left] if mins[left] < mins[right] else mins[right]
+            maxs[i] = maxs[left] if maxs[left] > maxs[right] else maxs[right]
+            sums[i] = sums[left] + sums[right]
+            counts[i] = counts[left] + counts[right]
+            i //= 2
+
+    def query(self, lo, hi):
+        """Aggregate slots [lo, hi), returning (min, max, sum, count)"""
+        mins, maxs, sums, counts = self.mins, self.maxs, self.sums, self.counts
+        lo += self.size
+        hi += self.size
+        result_min, result_max, result_sum, result_count = INF, -INF, 0.0, 0
+        while lo < hi:
+            if lo & 1:
+                result_min = min(result_min, mins[lo])
+                result_max = max(result_max, maxs[lo])
+                result_sum += sums[lo]
+                result_count += counts[lo]
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                result_min = min(result_min, mins[hi])
+                result_max = max(result_max, maxs[hi])
+                result_sum += sums[hi]
+                result_count += counts[hi]
+            lo //= 2
+            hi //= 2
+        return result_min, result_max, result_sum, result_count
+
+    @property
+    def nbytes(self):
+        return sum(a.buffer_info()[1] * a.itemsize for a in (self.mins, self.maxs, self.sums, self.counts))
+
+
+class RingBuffer:
+    """Fixed-size, array-backed buffer of the most recent samples
+
+    Samples must be appended in time order. Positions are "logical" (0 is the
+    oldest sample still held) or "physical" (index into the arrays).
+    """
+
+    def __init__(self, capacity=RECENT_HISTORY_HOURS * 3600 // SAMPLE_INTERVAL_SECONDS):
+        self.capacity = capacity
+        self.timestamps = array('d', [NAN]) * capacity
+        self.metrics = {name: array('d', [NAN]) * capacity for name in METRIC_FIELDS}
+        self.trees = {name: AggregateTree(capacity) for name in METRIC_FIELDS}
+        self.statuses = {name: array('b', [0]) * capacity for name in STATUS_FIELDS}
+        self.head = 0  # Physical slot the next sample is written to
+        self.count = 0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def for_interval(cls, interval_seconds, hours=RECENT_HISTORY_HOURS):
+        """Buffer sized to hold `hours` of samples taken every `interval_seconds`
+
+        Capped at RECENT_HISTORY_MAX_SAMPLES, so short intervals keep fewer hours
+        instead of growing the buffer past a few MB.
+        """
+        interval_seconds = max(interval_seconds, 1)
+        capacity = math.ceil(hours * 3600 / interval_seconds)
+        if capacity > RECENT_HISTORY_MAX_SAMPLES:
+            capacity = RECENT_HISTORY_MAX_SAMPLES
+            logger.warning(f"Sampling every {interval_seconds}s, recent history limited to the last "
+                           f"{capacity * interval_seconds / 3600:.1f} hours ({capacity} samples)")
+        return cls(capacity)
+
+    @property
+    def nbytes(self):
+        """Memory held by the columns and trees (fixed at construction)"""
+        columns = [self.timestamps] + list(self.metrics.values()) + list(self.statuses.values())
+        return sum(a.buffer_info()[1] * a.itemsize for a in columns) + sum(tree.nbytes for tree in self.trees.values())
+
+    def append(self, row):
+        """Add one saved row (as built by RaspberryPiMonitor.flatten_results)"""
+        timestamp = datetime.fromisoformat(row['timestamp']).timestamp()
+
+        with self.lock:
+            slot = self.head
+            self.timestamps[slot] = timestamp
+            for name in METRIC_FIELDS:
+                value = row.get(name, NAN)
+                try:
+                    value = float(value)
+                except (TypeError, ValueError):
+                    value = NAN
+                if value == -1:
+                    # -1 marks a metric that could not be collected
+                    value = NAN
+                self.metrics[name][slot] = value
+                self.trees[name].update(slot, value)
+            for name in STATUS_FIELDS:
+                self.statuses[name][slot] = STATUS_CODES.get(row.get(name), 0)
+
+            self.head = (slot + 1) % self.capacity
+            self.count = min(self.count + 1, self.capacity)
+
+    def _physical(self, logical):
+        return (self.head - self.count + logical) % self.capacity
+
+    def _bisect(self, timestamp):
+        """First logical position whose timestamp is >= timestamp"""
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.timestamps[self._physical(mid)] < timestamp:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _locate(self, start, end):
+        """Logical range [lo, hi) of samples with start <= timestamp < end"""
+        lo = self._bisect(start) if start is not None else 0
+        hi = self._bisect(end) if end is not None else self.count
+        return lo, max(lo, hi)
+
+    def _physical_ranges(self, lo, hi):
+        """Split a logical range into at most two contiguous physical ranges"""
+        if lo >= hi:
+            return []
+        first = self._physical(lo)
+        last = self._physical(hi - 1) + 1
+        if first < last:
+            return [(first, last)]
+        return [(first, self.capacity), (0, last)]
+
+    def _aggregate(self, name, lo, hi):
+        result_min, result_max, result_sum, result_count = INF, -INF, 0.0, 0
+        for p_lo, p_hi in self._physical_ranges(lo, hi):
+            part_min, part_max, part_sum, part_count = self.trees[name].query(p_lo, p_hi)
+            result_min = min(result_min, part_min)
+            result_max = max(result_max, part_max)
+            result_sum += part_sum
+            result_count += part_count
+        if result_count == 0:
+            return {'min': None, 'max': None, 'avg': None, 'count': 0}
+        return {
+            'min': result_min,
+            'max': result_max,
+            'avg': round(result_sum / result_count, 2),
+            'count': result_count,
+        }
+
+    def stats(self, name, start=None, end=None):
+        """min/max/avg of a metric over [start, end) epoch seconds, in O(log n)"""
+        with self.lock:
+            lo, hi = self._locate(start, end)
+            result = self._aggregate(name, lo, hi)
+            result['samples'] = hi - lo
+            return result
+
+    def sparkline(self, name, start, end, points):
+        """Averages of a metric over `points` equal time buckets between start and end"""
+        step = (end - start) / points
+        values = []
+        with self.lock:
+            edges = [self._bisect(start + i * step) for i in range(points)] + [self._bisect(end)]
+            for lo, hi in zip(edges, edges[1:]):
+                values.append(self._aggregate(name, lo, hi)['avg'])
+        return values
+
+    def series(self, start=None, end=None):
+        """All samples in [start, end) as lists per column"""
+        with self.lock:
+            lo, hi = self._locate(start, end)
+            slots = [self._physical(i) for i in range(lo, hi)]
+            result = {'timestamp': [datetime.fromtimestamp(self.timestamps[s]).isoformat() for s in slots]}
+            for name, column in self.metrics.items():
+                result[name] = [None if math.isnan(column[s]) else column[s] for s in slots]
+            for name, column in self.statuses.items():
+                result[name] = [STATUS_VALUES[column[s]] for s in slots]
+            return result
+
+    def latest(self):
+        """The most recent sample, or None if the buffer is empty"""
+        with self.lock:
+            if self.count == 0:
+                return None
+            slot = self._physical(self.count - 1)
+            result = {'timestamp': datetime.fromtimestamp(self.timestamps[slot]).isoformat()}
+            for name, column in self.metrics.items():
+                result[name] = None if math.isnan(column[slot]) else column[slot]
+            for name, column in self.statuses.items():
+                result[name] = STATUS_VALUES[column[slot]]
+            return result
+
+    def warm_up(self, data_dir, hours=RECENT_HISTORY_HOURS):
+        """Fill the buffer from the daily reports once at startup"""
+        since = datetime.now() - timedelta(hours=hours)
+        day = since.date()
+        loaded = 0
+        while day <= datetime.now().date():
+            path = os.path.join(data_dir, 'reports', f"report_{day.isoformat()}.csv")
+            day += timedelta(days=1)
+            if not os.path.isfile(path):
+                continue
+            try:
+                with open(path, newline='') as f:
+                    for row in csv.DictReader(f):
+                        try:
+                            if datetime.fromisoformat(row['timestamp']) >= since:
+                                self.append(row)
+                                loaded += 1
+                        except (KeyError, TypeError, ValueError):
+                            continue
+            except Exception as e:
+                logger.error(f"Failed to load {path} into recent history: {str(e)}")
+        logger.info(f"Loaded {loaded} samples into recent history ({self.nbytes // 1024} KB)")
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """Answers recent-history queries from the dashboard"""
+
+    buffer = None
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        endpoint = url.path.rstrip('/').split('/')[-1]
+
+        try:
+            end = time.time()
+            start = end - float(params.get('minutes', 60)) * 60
+            metric = params.get('metric', 'cpu_percent')
+            if endpoint in ('stats', 'sparkline') and metric not in METRIC_FIELDS:
+                raise ValueError(f"unknown metric {metric}")
+
+            if endpoint == 'stats':
+                body = self.buffer.stats(metric, start, end)
+            elif endpoint == 'sparkline':
+                points = max(1, min(1000, int(params.get('points', 60))))
+                body = {'metric': metric, 'points': self.buffer.sparkline(metric, start, end, points)}
+            elif endpoint == 'series':
+                body = self.buffer.series(start, end)
+            elif endpoint == 'latest':
+                body = self.buffer.latest()
+            else:
+                self._reply(404, {'error': f"unknown query {url.path}"})
+                return
+        except ValueError as e:
+            self._reply(400, {'error': str(e)})
+            return
+
+        self._reply(200, body)
+
+    def _reply(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_queries(buffer, host=QUERY_HOST, port=QUERY_PORT):
+    """Serve recent-history queries from a background thread"""
+    handler = type('BoundQueryHandler', (QueryHandler,), {'buffer': buffer})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name='recent-history', daemon=True)
+    thread.start()
+    logger.info(f"Serving recent history on http://{host}:{port}/recent/")
+    return server
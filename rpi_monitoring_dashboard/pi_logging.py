@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Raspberry Pi 5 Monitoring - Logging pipeline
+
+Log records from pi_monitor.py and its modules go through a bounded queue to
+a background writer thread:
+1. The sampling thread only enqueues; a full queue drops records (and the
+   writer reports how many) instead of blocking
+2. Identical messages repeated within a window are suppressed
+3. The log file is rotated by size
+
+pi_monitor.py sets it up on first use, so the --summary/--check fast path
+never imports it or opens the log file.
+"""
+
+import os
+import sys
+import time
+import queue
+import atexit
+import logging
+import logging.handlers
+from collections import OrderedDict
+
+# Logging settings
+LOG_FILE = '/var/log/pi_monitor.log'
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+LOG_MAX_BYTES = 5 * 1024 * 1024  # Rotate the log file at 5 MB
+LOG_BACKUP_COUNT = 3  # Keep pi_monitor.log.1 .. pi_monitor.log.3
+LOG_QUEUE_SIZE = 1000  # Records buffered before new ones are dropped
+LOG_DUPLICATE_WINDOW = 300  # Seconds to suppress repeats of the same message
+LOG_DUPLICATE_MAX_MESSAGES = 1000  # Distinct messages tracked, least recently seen are forgotten first
+
+
+class DropOnFullQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks the caller.
+
+    When the queue is full (the writer thread is stuck on a slow disk) the
+    record is dropped and counted instead of stalling the sampling cycle.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class DuplicateFilter(logging.Filter):
+    """Suppress identical messages repeated within a time window.
+
+    Critical conditions are logged on every cycle, so the same warning would
+    otherwise be written once per sample. The first occurrence passes, repeats
+    are counted, and the next one after the window notes how many were skipped.
+    At most max_messages distinct messages are tracked (least recently seen
+    are forgotten first), and expired ones are pruned once per window.
+    """
+
+    def __init__(self, window=LOG_DUPLICATE_WINDOW, max_messages=LOG_DUPLICATE_MAX_MESSAGES):
+        super().__init__()
+        self.window = window
+        self.max_messages = max_messages
+        self.last_seen = OrderedDict()  # (levelno, message) -> [first emit time, suppressed count]
+        self.next_prune = time.monotonic() + window
+
+    def filter(self, record):
+        key = (record.levelno, record.getMessage())
+        now = time.monotonic()
+        entry = self.last_seen.get(key)
+
+        if entry is not None and now - entry[0] < self.window:
+            entry[1] += 1
+            self.last_seen.move_to_end(key)
+            return False
+
+        if entry is not None and entry[1] > 0:
+            record.msg = f"{record.getMessage()} (repeated {entry[1]} times in the last {int(now - entry[0])}s)"
+            record.args = None
+
+        # Forget messages that have not been seen for a full window
+        if now >= self.next_prune:
+            self.last_seen = OrderedDict((k, v) for k, v in self.last_seen.items() if now - v[0] < self.window)
+            self.next_prune = now + self.window
+
+        self.last_seen[key] = [now, 0]
+        self.last_seen.move_to_end(key)
+        if len(self.last_seen) > self.max_messages:
+            self.last_seen.popitem(last=False)
+        return True
+
+
+class DropReportingQueueListener(logging.handlers.QueueListener):
+    """QueueListener that logs how many records the queue handler dropped.
+
+    The count is checked on the listener thread before each record is written,
+    so a full queue is reported as soon as the writer catches up.
+    """
+
+    def __init__(self, queue_handler, *handlers, **kwargs):
+        super().__init__(queue_handler.queue, *handlers, **kwargs)
+        self.queue_handler = queue_handler
+        self.reported_drops = 0
+
+    def handle(self, record):
+        dropped = self.queue_handler.dropped
+        if dropped != self.reported_drops:
+            super().handle(logging.makeLogRecord({
+                'name': 'pi_monitor',
+                'levelno': logging.WARNING,
+                'levelname': 'WARNING',
+                'msg': f"Log queue full, dropped {dropped - self.reported_drops} record(s)",
+            }))
+            self.reported_drops = dropped
+        super().handle(record)
+
+
+def setup_logging():
+    """Route all log records through a bounded queue to a background writer.
+
+    The calling thread only enqueues records; file and stream output happen on
+    the QueueListener thread, so a slow or read-only root filesystem never adds
+    latency to a monitoring cycle.
+    """
+    formatter = logging.Formatter(LOG_FORMAT)
+    output_handlers = []
+
+    try:
+        # Create log directory if it doesn't exist
+        os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
+        file_handler = logging.handlers.RotatingFileHandler(
+            LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT
+        )
+        file_handler.setFormatter(formatter)
+        output_handlers.append(file_handler)
+    except Exception as e:
+        # If we can't create the log file, just log to stderr
+        print(f"Warning: Could not create log file: {str(e)}", file=sys.stderr)
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(formatter)
+    output_handlers.append(stream_handler)
+
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    queue_handler = DropOnFullQueueHandler(log_queue)
+    queue_handler.addFilter(DuplicateFilter())
+
+    root_logger = logging.getLogger()
+    root_logger.setLevel(logging.INFO)
+    root_logger.addHandler(queue_handler)
+
+    listener = DropReportingQueueListener(queue_handler, *output_handlers, respect_handler_level=True)
+    listener.start()
+    # Flush whatever is still queued when the process exits
+    atexit.register(listener.stop)
+
+    return listener
+
+
+def redirect_log_file(log_listener, log_file):
+    """Write the log to another file from now on, e.g. into the scratch directory of a replay"""
+    file_handler = logging.handlers.RotatingFileHandler(log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT)
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    # Stop the writer thread first so no record is being written while the handlers change
+    log_listener.stop()
+    for handler in log_listener.handlers:
+        if isinstance(handler, logging.FileHandler):
+            handler.close()
+    log_listener.handlers = tuple(
+        handler for handler in log_listener.handlers if not isinstance(handler, logging.FileHandler)
+    ) + (file_handler,)
+    log_listener.start()
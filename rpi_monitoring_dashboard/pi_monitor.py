@@ -12,59 +12,337 @@ This script monitors:
 7. RAM usage
 8. System temperature
 9. Internet connectivity
+10. Every network interface (state, addresses, traffic and error rates)
+11. Every disk-backed mount (ro/rw, capacity, growth rate)
 
-It can be set up as a systemd service or run via cron.
+Each check is registered with @register_collector, declaring its CSV columns,
+cost class, dependencies, alerts and summary line. A subset can be run with
+--only cpu,temp or --max-cost cheap.
+
+Cron and health scripts should use --summary or --check, which read the
+daemon's status.json and only run the checks when it is stale.
+
+History analytics (uptime, gaps, incidents) are published by pi_analytics.py,
+and samples are shipped to a central receiver by pi_shipper.py.
+
+It can be set up as a systemd service (pi_monitor.py --daemon, which also keeps
+recent history in memory, see pi_history.py) or run via cron.
 """
 
 import os
-import subprocess
 import time
-import logging
 import json
 from datetime import datetime
-import socket
 import sys
+import argparse
+import importlib
+
+# The logging pipeline (pi_logging.py) is started on first use, so the
+# --summary/--check fast path never imports logging, starts the writer thread
+# or opens the log file
+log_listener = None
+
+class LazyLogger:
+    """Stands in for the pi_monitor logger until something logs"""
+
+    def __getattr__(self, name):
+        start_logging()
+        return getattr(logger, name)
+
+logger = LazyLogger()
 
-# Create log directory if it doesn't exist
-os.makedirs('/var/log', exist_ok=True)
-
-# Configure logging
-try:
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler('/var/log/pi_monitor.log'),
-            logging.StreamHandler()
-        ]
-    )
-except Exception as e:
-    # If we can't create the log file, just log to stderr
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.StreamHandler()
-        ]
-    )
-    print(f"Warning: Could not create log file: {str(e)}", file=sys.stderr)
-
-logger = logging.getLogger('pi_monitor')
-
-# Try to import psutil, provide installation instructions if missing
-try:
-    import psutil
-except ImportError:
-    logger.error("psutil module not found. Please install it using: sudo pip3 install psutil")
-    print("ERROR: psutil module not found. Please install it using: sudo pip3 install psutil", file=sys.stderr)
-    # We'll continue without it and handle the missing module in each function
+def start_logging():
+    """Set up the logging pipeline if it is not running yet"""
+    global log_listener, logger
+    if log_listener is None:
+        import logging
+        import pi_logging
+        log_listener = pi_logging.setup_logging()
+        logger = logging.getLogger('pi_monitor')
+    return log_listener
+
+
+def redirect_log_file(log_file):
+    """Write the log to another file from now on, e.g. into the scratch directory of a replay"""
+    import pi_logging
+    pi_logging.redirect_log_file(start_logging(), log_file)
+
+
+# psutil, the modules only the checks use and the pi_*.py modules are imported
+# on first use, so the --summary fast path does not pay for them (numpy alone
+# takes longer than the summary)
+psutil = None
+subprocess = None
+socket = None
+
+def import_collection_modules():
+    """Import the standard modules the checks need"""
+    global subprocess, socket
+    import subprocess
+    import socket
+
+def import_psutil():
+    """Try to import psutil, provide installation instructions if missing"""
+    global psutil
+    if psutil is not None:
+        return
+    try:
+        import psutil as psutil_module
+        psutil = psutil_module
+    except ImportError:
+        logger.error("psutil module not found. Please install it using: sudo pip3 install psutil")
+        print("ERROR: psutil module not found. Please install it using: sudo pip3 install psutil", file=sys.stderr)
+        # We'll continue without it and handle the missing module in each function
+
+_optional_modules = {}
+
+def optional_module(name):
+    """Import one of the pi_*.py modules that live next to this script, or return None if it is missing"""
+    if name not in _optional_modules:
+        try:
+            _optional_modules[name] = importlib.import_module(name)
+        except ImportError:
+            _optional_modules[name] = None
+    return _optional_modules[name]
 
 # File to store monitoring data
 DATA_DIR = '/var/www/camera-dashboard/metrics'
 DATA_FILE = os.path.join(DATA_DIR, 'status.json')
 
+# How often analytics.json is rebuilt from the daily reports, and how many days it covers
+ANALYTICS_REFRESH_SECONDS = 300
+ANALYTICS_DAYS = 31  # Today and the 30 days before it, the dashboard's default range
+ANALYTICS_FILE_NAME = 'analytics.json'  # Same as pi_analytics.ANALYTICS_FILE_NAME
+
+# Central receiver for metric shipping, shipping is disabled when unset
+SHIP_URL = os.environ.get('PI_MONITOR_SHIP_URL')
+SPOOL_DIR = '/var/lib/pi_monitor/spool'
+
+# Collection interval when running as a resident daemon (--daemon)
+MONITOR_INTERVAL_SECONDS = 60
+
+# --summary/--check use the daemon's status.json if it is at most this old
+SNAPSHOT_MAX_AGE_SECONDS = 2 * MONITOR_INTERVAL_SECONDS
+
+# Filesystem types reported by the mounts check (disk-backed storage, not /proc, tmpfs etc.).
+# Network filesystems are left out: statvfs on a hung server blocks with no timeout.
+DISK_FILESYSTEMS = {'ext2', 'ext3', 'ext4', 'vfat', 'exfat', 'ntfs', 'ntfs3', 'fuseblk',
+                    'btrfs', 'xfs', 'f2fs'}
+
+# Octal escapes used for whitespace and backslashes in /proc/self/mounts (backslash last)
+MOUNT_PATH_ESCAPES = [('\\040', ' '), ('\\011', '\t'), ('\\012', '\n'), ('\\134', '\\')]
+
+# Collector cost classes, cheapest first
+COST_CHEAP = 'cheap'  # Reads from /sys or psutil
+COST_MODERATE = 'moderate'  # Runs subprocesses or scans directories
+COST_EXPENSIVE = 'expensive'  # Blocks for a sample window or probes the network
+COST_CLASSES = [COST_CHEAP, COST_MODERATE, COST_EXPENSIVE]
+
+
+class Collector:
+    """A registered monitoring check
+
+    name:     key of the check's result in run_all_checks()
+    method:   name of the RaspberryPiMonitor method that runs the check
+    aliases:  short names accepted by --only
+    cost:     one of COST_CLASSES
+    depends:  names of collectors that must run before this one
+    columns:  (csv column, result key, default) tuples written by save_results;
+              a numeric default also replaces non-numeric values
+    alerts:   functions of the result returning (message, fails exit code) tuples
+    summary:  (label, format string) for the summary printout, or a function
+              of the result returning the printout lines
+    """
+
+    def __init__(self, name, method, aliases=(), cost=COST_CHEAP, depends=(), columns=(), alerts=(), summary=None):
+        self.name = name
+        self.method = method
+        self.aliases = tuple(aliases)
+        self.cost = cost
+        self.depends = tuple(depends)
+        self.columns = tuple(columns)
+        self.alerts = tuple(alerts)
+        self.summary = summary
+
+    def row_values(self, result):
+        """CSV column values for this collector's result"""
+        values = {}
+        for column, key, default in self.columns:
+            value = result.get(key, default)
+            if isinstance(default, (int, float)) and isinstance(value, str):
+                value = default
+            values[column] = value
+        return values
+
+    def check_alerts(self, result):
+        issues = []
+        for alert in self.alerts:
+            issues.extend(alert(result))
+        return issues
+
+    def summary_lines(self, result):
+        if self.summary is None:
+            return []
+        if callable(self.summary):
+            return self.summary(result)
+        label, template = self.summary
+        try:
+            return [f"{label}: {template.format(**result)}"]
+        except (KeyError, IndexError, ValueError):
+            return [f"{label}: {result.get('status', 'unknown')}"]
+
+
+# All collectors in registration order, which is also the CSV column order
+COLLECTORS = []
+
+
+def register_collector(name, **options):
+    """Decorator registering a RaspberryPiMonitor method as a collector"""
+    def decorator(method):
+        COLLECTORS.append(Collector(name, method.__name__, **options))
+        return method
+    return decorator
+
+
+def resolve_collectors(only=None, max_cost=None):
+    """Collectors to run for a selection, with their dependencies, in registration order
+
+    only is a list of collector names or aliases; max_cost drops collectors
+    costlier than the given class (dependencies are always kept).
+    """
+    by_name = {}
+    for collector in COLLECTORS:
+        by_name[collector.name] = collector
+        for alias in collector.aliases:
+            by_name[alias] = collector
+
+    if only:
+        unknown = [name for name in only if name not in by_name]
+        if unknown:
+            raise ValueError(f"Unknown check(s): {', '.join(unknown)}. Available: {', '.join(sorted(by_name))}")
+        selected = [by_name[name] for name in only]
+    else:
+        selected = list(COLLECTORS)
+
+    if max_cost is not None:
+        limit = COST_CLASSES.index(max_cost)
+        too_costly = [c.name for c in selected if COST_CLASSES.index(c.cost) > limit]
+        selected = [c for c in selected if COST_CLASSES.index(c.cost) <= limit]
+        if not selected:
+            # An empty run would print an empty summary and exit 0, which reads as healthy
+            raise ValueError(f"No checks left to run: {', '.join(too_costly)} cost more than {max_cost}")
+
+    # Pull in dependencies
+    wanted = set()
+    pending = [c.name for c in selected]
+    while pending:
+        name = pending.pop()
+        if name not in wanted:
+            wanted.add(name)
+            pending.extend(by_name[name].depends)
+
+    return [c for c in COLLECTORS if c.name in wanted]
+
+
+def threshold_alert(key, limit, message, fails=False):
+    """Alert when result[key] is a number above limit; message is formatted with the result"""
+    def alert(result):
+        value = result.get(key)
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and value > limit:
+            return [(message.format(**result), fails)]
+        return []
+    return alert
+
+
+def status_alert(key, value, message, fails=False):
+    """Alert when result[key] equals value"""
+    def alert(result):
+        return [(message, fails)] if result.get(key) == value else []
+    return alert
+
+
+def oldest_pending_video_alert(result):
+    """Alert when the oldest pending video is more than 24 hours old"""
+    if result.get('first_file_timestamp'):
+        try:
+            oldest_time = datetime.fromisoformat(result['first_file_timestamp'])
+            age_hours = (datetime.now() - oldest_time).total_seconds() / 3600
+            if age_hours > 24:
+                return [(f"Oldest pending video is {age_hours:.1f} hours old!", True)]
+        except Exception:
+            pass
+    return []
+
+
+def critical_issues(results):
+    """Alerts raised by the collectors present in results, as (message, fails exit code) tuples"""
+    issues = []
+    for collector in COLLECTORS:
+        result = results.get(collector.name)
+        if isinstance(result, dict):
+            issues.extend(collector.check_alerts(result))
+    return issues
+
+
+def interface_errors_alert(result):
+    """Alert when an interface reported new rx/tx errors since the previous sample"""
+    issues = []
+    for name, info in result.get('interfaces', {}).items():
+        errors = (info.get('rx_errors_per_s') or 0) + (info.get('tx_errors_per_s') or 0)
+        if errors > 0:
+            issues.append((f"{name} is reporting {errors:.2f} errors/s!", False))
+    return issues
+
+
+def mounts_alert(result):
+    """Alert when a mount other than / is read-only or nearly full (/ is covered by root_mount and disk_usage)"""
+    issues = []
+    for mount_point, info in result.get('mounts', {}).items():
+        if mount_point == '/':
+            continue
+        if info.get('mode') == 'ro':
+            issues.append((f"{mount_point} is mounted READ-ONLY!", False))
+        if info.get('percent_used', 0) > 90:
+            issues.append((f"{mount_point} usage above 90%!", False))
+    return issues
+
+
+def network_interfaces_summary(result):
+    if 'interfaces' not in result:
+        return [f"Interfaces: {result.get('status', 'unknown')}"]
+    parts = []
+    for name, info in result['interfaces'].items():
+        addresses = [addr for addr in info.get('addresses', []) if ':' not in addr]  # IPv4 only, to keep it short
+        parts.append(f"{name} {info.get('state', 'unknown')}" + (f" {addresses[0]}" if addresses else ''))
+    return [f"Interfaces: {', '.join(parts) or 'none'}"]
+
+
+def mounts_summary(result):
+    if 'mounts' not in result:
+        return [f"Mounts: {result.get('status', 'unknown')}"]
+    parts = [
+        f"{mount_point} error" if info.get('status') == 'error' else f"{mount_point} {info['mode']} {info['percent_used']}%"
+        for mount_point, info in result['mounts'].items()
+    ]
+    return [f"Mounts: {', '.join(parts) or 'none'}"]
+
+
+def pending_videos_summary(result):
+    if 'count' not in result:
+        return [f"Pending Videos: {result.get('status', 'unknown')}"]
+    lines = [f"Pending Videos: {result['count']} files"]
+    if result['count'] > 0:
+        lines.append(f"  Oldest: {result.get('first_file', 'unknown')} ({result.get('first_file_timestamp', 'unknown')})")
+        lines.append(f"  Newest: {result.get('latest_file', 'unknown')} ({result.get('latest_file_timestamp', 'unknown')})")
+    return lines
+
+
 class RaspberryPiMonitor:
-    def __init__(self):
+    def __init__(self, ship=True):
+        start_logging()
+        import_collection_modules()
+        import_psutil()
+
         # Create data directory if it doesn't exist
         try:
             os.makedirs(DATA_DIR, exist_ok=True)
@@ -72,6 +350,26 @@ class RaspberryPiMonitor:
             logger.error(f"Failed to create data directory {DATA_DIR}: {str(e)}")
             # Try using a temp directory instead
             self.use_temp_dir()
+
+        # ship=False (replays) never opens the live spool
+        self.shipper = None
+        pi_shipper = optional_module('pi_shipper') if SHIP_URL and ship else None
+        if pi_shipper is not None:
+            try:
+                self.shipper = pi_shipper.MetricShipper(SHIP_URL, SPOOL_DIR)
+            except Exception as e:
+                logger.error(f"Failed to set up metric shipping: {str(e)}")
+        elif SHIP_URL and ship:
+            logger.warning("pi_shipper module not found, metrics will not be shipped")
+        # Set by run_forever, which flushes the spool on its own thread
+        self.ship_wakeup = None
+
+        # In-memory recent history, only kept by the resident daemon
+        self.recent = None
+
+        # Previous (monotonic time, values) of the interface counters and mount usage, for rates
+        self.net_counters = None
+        self.mount_usage = None
     
     def use_temp_dir(self):
         """Use a temporary directory if the main data directory can't be created"""
@@ -137,14 +435,26 @@ class RaspberryPiMonitor:
                 'details': str(e)
             }
     
+    @register_collector('apc_status', aliases=['apc'], cost=COST_MODERATE,
+                        columns=[('apc_status', 'status', 'unknown')],
+                        alerts=[status_alert('status', 'stopped', "APC service is STOPPED!", fails=True)],
+                        summary=('APC Status', '{status}'))
     def check_apc_status(self):
         """Check supervisorctl apc status"""
         return self.check_supervisor_service_status('apc')
         
+    @register_collector('rtsp_recorder_status', aliases=['rtsp'], cost=COST_MODERATE,
+                        columns=[('rtsp_recorder_status', 'status', 'unknown')],
+                        alerts=[status_alert('status', 'stopped', "RTSP Recorder service is STOPPED!", fails=True)],
+                        summary=('RTSP Recorder Status', '{status}'))
     def check_rtsp_recorder_status(self):
         """Check supervisorctl rtsp_recorder status"""
         return self.check_supervisor_service_status('rtsp_recorder')
 
+    @register_collector('eth0_status', aliases=['eth0'], cost=COST_MODERATE,
+                        columns=[('eth0_status', 'status', 'unknown'), ('eth0_ip', 'ip_address', 'unknown')],
+                        alerts=[status_alert('status', 'down', "eth0 interface is DOWN!", fails=True)],
+                        summary=('eth0 Status', '{status} | IP: {ip_address}'))
     def check_eth0_status(self):
         """Check eth0 network interface status and IP address"""
         try:
@@ -191,6 +501,10 @@ class RaspberryPiMonitor:
                 'details': str(e)
             }
     
+    @register_collector('root_mount', aliases=['root', 'root_mode'], cost=COST_MODERATE,
+                        columns=[('root_mount_mode', 'mode', 'unknown')],
+                        alerts=[status_alert('mode', 'ro', "Root filesystem is mounted READ-ONLY!", fails=True)],
+                        summary=('Root Mount', '{mode}'))
     def check_root_mount_mode(self):
         """Check if / is mounted as read-only or read-write"""
         try:
@@ -244,6 +558,10 @@ class RaspberryPiMonitor:
                 'details': str(e)
             }
     
+    @register_collector('cpu_usage', aliases=['cpu'], cost=COST_EXPENSIVE,
+                        columns=[('cpu_percent', 'percent_used', -1)],
+                        alerts=[threshold_alert('percent_used', 95, "CPU usage above 95%!")],
+                        summary=('CPU Usage', '{percent_used}% used'))
     def check_cpu_usage(self):
         """Check CPU usage percentage"""
         try:
@@ -281,6 +599,13 @@ class RaspberryPiMonitor:
                 'details': str(e)
             }
     
+    @register_collector('pending_videos', aliases=['pending', 'videos'], cost=COST_MODERATE,
+                        columns=[('pending_videos', 'count', 0),
+                                 ('oldest_video', 'first_file_timestamp', ''),
+                                 ('newest_video', 'latest_file_timestamp', '')],
+                        alerts=[threshold_alert('count', 100, "Too many pending videos: {count} files!", fails=True),
+                                oldest_pending_video_alert],
+                        summary=pending_videos_summary)
     def check_pending_videos(self):
         """Check pending video files in input_videos directory"""
         try:
@@ -369,6 +694,10 @@ class RaspberryPiMonitor:
                 'details': str(e)
             }
     
+    @register_collector('disk_usage', aliases=['disk'], cost=COST_CHEAP,
+                        columns=[('disk_percent', 'percent_used', -1)],
+                        alerts=[threshold_alert('percent_used', 90, "Disk usage above 90%!")],
+                        summary=('Disk Usage', '{percent_used}% used'))
     def check_disk_usage(self):
         """Check disk usage for the root filesystem"""
         try:
@@ -413,6 +742,10 @@ class RaspberryPiMonitor:
                 'details': str(e)
             }
     
+    @register_collector('ram_usage', aliases=['ram'], cost=COST_CHEAP,
+                        columns=[('ram_percent', 'percent_used', -1)],
+                        alerts=[threshold_alert('percent_used', 85, "RAM usage above 85%!")],
+                        summary=('RAM Usage', '{percent_used}% used'))
     def check_ram_usage(self):
         """Check RAM usage"""
         try:
@@ -457,6 +790,10 @@ class RaspberryPiMonitor:
                 'details': str(e)
             }
     
+    @register_collector('system_temperature', aliases=['temp', 'temperature'], cost=COST_CHEAP,
+                        columns=[('temperature_c', 'temperature_c', -1)],
+                        alerts=[threshold_alert('temperature_c', 80, "System temperature is {temperature_c}°C!")],
+                        summary=('System Temperature', '{temperature_c}°C'))
     def check_system_temperature(self):
         """Check system temperature"""
         try:
@@ -508,6 +845,10 @@ class RaspberryPiMonitor:
                 'details': str(e)
             }
     
+    @register_collector('internet_connectivity', aliases=['internet'], cost=COST_EXPENSIVE,
+                        columns=[('internet_status', 'status', 'unknown')],
+                        alerts=[status_alert('status', 'disconnected', "Internet connection is down!")],
+                        summary=('Internet', '{status}'))
     def check_internet_connectivity(self):
         """Check if the device is connected to the internet"""
         try:
@@ -548,21 +889,155 @@ class RaspberryPiMonitor:
                 'details': str(e)
             }
     
-    def run_all_checks(self):
-        """Run all monitoring checks and return the results"""
+    @register_collector('network_interfaces', aliases=['interfaces', 'net'], cost=COST_MODERATE,
+                        alerts=[interface_errors_alert],
+                        summary=network_interfaces_summary)
+    def check_network_interfaces(self):
+        """Check state, addresses and traffic of every network interface in one pass"""
+        try:
+            now = time.monotonic()
+
+            # All counters come from a single read of /proc/net/dev (same values as /sys/class/net/*/statistics)
+            counters = {}
+            with open('/proc/net/dev') as f:
+                for line in f.readlines()[2:]:
+                    name, _, fields = line.partition(':')
+                    values = fields.split()
+                    if len(values) >= 16:
+                        counters[name.strip()] = {
+                            'rx_bytes': int(values[0]),
+                            'rx_errors': int(values[2]),
+                            'tx_bytes': int(values[8]),
+                            'tx_errors': int(values[10])
+                        }
+
+            # State and addresses of all interfaces from a single ip call
+            links = {}
+            try:
+                ip_cmd = subprocess.run(['ip', '-j', 'addr', 'show'],
+                                        capture_output=True, text=True, timeout=5)
+                ip_output = ip_cmd.stdout if ip_cmd.returncode == 0 else None
+            except (OSError, subprocess.TimeoutExpired) as e:
+                logger.warning(f"ip -j addr show failed, reading interface state from sysfs: {str(e)}")
+                ip_output = None
+            if ip_output is not None:
+                for link in json.loads(ip_output or '[]'):
+                    links[link['ifname']] = {
+                        'state': link.get('operstate', 'UNKNOWN').lower(),
+                        'addresses': [addr['local'] for addr in link.get('addr_info', []) if 'local' in addr]
+                    }
+            else:
+                # No ip binary, a hung call or older iproute2 without JSON output: fall back to sysfs for the state
+                for name in counters:
+                    try:
+                        with open(f'/sys/class/net/{name}/operstate') as f:
+                            links[name] = {'state': f.read().strip(), 'addresses': []}
+                    except OSError:
+                        pass
+
+            # Rates since the previous sample (only known from the second sample of a daemon run)
+            previous_time, previous = self.net_counters or (None, {})
+            elapsed = now - previous_time if previous_time is not None else None
+            self.net_counters = (now, counters)
+
+            interfaces = {}
+            for name in sorted(set(counters) | set(links)):
+                if name == 'lo':
+                    continue
+                info = dict(links.get(name, {'state': 'unknown', 'addresses': []}))
+                current = counters.get(name, {})
+                info.update(current)
+                before = previous.get(name)
+                for key in ('rx_bytes', 'tx_bytes', 'rx_errors', 'tx_errors'):
+                    rate = None
+                    if before and elapsed and key in current and current[key] >= before[key]:
+                        # A smaller counter means the interface was reset, skip the rate for this sample
+                        rate = round((current[key] - before[key]) / elapsed, 2)
+                    info[key + '_per_s'] = rate
+                interfaces[name] = info
+
+            return {
+                'count': len(interfaces),
+                'interfaces': interfaces
+            }
+        except Exception as e:
+            logger.error(f"Failed to check network interfaces: {str(e)}")
+            return {
+                'status': 'error',
+                'details': str(e)
+            }
+
+    @register_collector('mounts', aliases=['mount_points'], cost=COST_CHEAP,
+                        alerts=[mounts_alert],
+                        summary=mounts_summary)
+    def check_mounts(self):
+        """Check mode and capacity of every disk-backed mount in one pass"""
+        try:
+            now = time.monotonic()
+            with open('/proc/self/mounts') as f:
+                entries = [line.split() for line in f]
+
+            previous_time, previous = self.mount_usage or (None, {})
+            elapsed = now - previous_time if previous_time is not None else None
+
+            mounts = {}
+            usage = {}
+            for entry in entries:
+                if len(entry) < 4 or entry[2] not in DISK_FILESYSTEMS:
+                    continue
+                device, mount_point, fs_type, options = entry[:4]
+                for escaped, char in MOUNT_PATH_ESCAPES:
+                    mount_point = mount_point.replace(escaped, char)
+                # If a path is mounted twice, the later (visible) entry wins
+                try:
+                    stat = os.statvfs(mount_point)
+                except OSError as e:
+                    # e.g. unmounted since /proc/self/mounts was read; the other mounts are still valid
+                    mounts[mount_point] = {
+                        'device': device,
+                        'fs_type': fs_type,
+                        'status': 'error',
+                        'details': str(e)
+                    }
+                    continue
+                total = stat.f_blocks * stat.f_frsize
+                free = stat.f_bavail * stat.f_frsize
+                used = total - stat.f_bfree * stat.f_frsize
+                usage[mount_point] = used
+
+                growth = None
+                if elapsed and mount_point in previous:
+                    growth = round((used - previous[mount_point]) / elapsed, 2)
+
+                mounts[mount_point] = {
+                    'device': device,
+                    'fs_type': fs_type,
+                    'mode': 'ro' if 'ro' in options.split(',') else 'rw',
+                    'total_gb': round(total / (1024**3), 2),
+                    'free_gb': round(free / (1024**3), 2),
+                    'percent_used': round(used / (used + free) * 100, 1) if used + free > 0 else 0.0,
+                    'used_bytes_per_s': growth
+                }
+
+            self.mount_usage = (now, usage)
+            return {
+                'count': len(mounts),
+                'mounts': mounts
+            }
+        except Exception as e:
+            logger.error(f"Failed to check mounts: {str(e)}")
+            return {
+                'status': 'error',
+                'details': str(e)
+            }
+    
+    def run_all_checks(self, only=None, max_cost=None):
+        """Run the registered checks (all, or a selection) and return the results"""
         results = {
-            'timestamp': datetime.now().isoformat(),
-            'apc_status': self.check_apc_status(),
-            'rtsp_recorder_status': self.check_rtsp_recorder_status(),
-            'eth0_status': self.check_eth0_status(),
-            'root_mount': self.check_root_mount_mode(),
-            'cpu_usage': self.check_cpu_usage(),
-            'pending_videos': self.check_pending_videos(),
-            'disk_usage': self.check_disk_usage(),
-            'ram_usage': self.check_ram_usage(),
-            'system_temperature': self.check_system_temperature(),
-            'internet_connectivity': self.check_internet_connectivity()
+            'timestamp': datetime.now().isoformat()
         }
+        for collector in resolve_collectors(only, max_cost):
+            results[collector.name] = getattr(self, collector.method)()
         
         # Check for any critical conditions
         self.check_critical_conditions(results)
@@ -571,143 +1046,47 @@ class RaspberryPiMonitor:
     
     def check_critical_conditions(self, results):
         """Check for any critical conditions and log warnings"""
-        # Disk space critical if > 90%
-        disk_usage = results['disk_usage']
-        if 'percent_used' in disk_usage and not isinstance(disk_usage, str) and disk_usage['percent_used'] > 90:
-            logger.warning("CRITICAL: Disk usage above 90%!")
-        
-        # RAM critical if > 85%
-        ram_usage = results['ram_usage']
-        if 'percent_used' in ram_usage and not isinstance(ram_usage, str) and ram_usage['percent_used'] > 85:
-            logger.warning("CRITICAL: RAM usage above 85%!")
-            
-        # CPU critical if > 95%
-        cpu_usage = results['cpu_usage']
-        if 'percent_used' in cpu_usage and not isinstance(cpu_usage, str) and cpu_usage['percent_used'] > 95:
-            logger.warning("CRITICAL: CPU usage above 95%!")
-        
-        # Temperature critical if > 80°C
-        temp = results['system_temperature']
-        if 'temperature_c' in temp and not isinstance(temp, str) and temp['temperature_c'] > 80:
-            logger.warning(f"CRITICAL: System temperature is {temp['temperature_c']}°C!")
-        
-        # Check if internet is disconnected
-        internet = results['internet_connectivity']
-        if 'status' in internet and internet['status'] == 'disconnected':
-            logger.warning("CRITICAL: Internet connection is down!")
-            
-        # Check if APC is stopped
-        apc = results['apc_status']
-        if 'status' in apc and apc['status'] == 'stopped':
-            logger.warning("CRITICAL: APC service is STOPPED!")
-            
-        # Check if rtsp_recorder is stopped
-        rtsp = results.get('rtsp_recorder_status', {})
-        if 'status' in rtsp and rtsp['status'] == 'stopped':
-            logger.warning("CRITICAL: RTSP Recorder service is STOPPED!")
-            
-        # Check if eth0 is down
-        eth0 = results.get('eth0_status', {})
-        if 'status' in eth0 and eth0['status'] == 'down':
-            logger.warning("CRITICAL: eth0 interface is DOWN!")
-            
-        # Check if root is mounted read-only
-        root_mount = results.get('root_mount', {})
-        if 'mode' in root_mount and root_mount['mode'] == 'ro':
-            logger.warning("CRITICAL: Root filesystem is mounted READ-ONLY!")
-            
-        # Check if too many pending videos (>100)
-        pending = results.get('pending_videos', {})
-        if 'count' in pending and isinstance(pending['count'], int) and pending['count'] > 100:
-            logger.warning(f"CRITICAL: Too many pending videos: {pending['count']} files!")
-            
-        # Check if oldest pending video is too old (>24 hours)
-        if 'first_file_timestamp' in pending and pending['first_file_timestamp']:
-            try:
-                oldest_time = datetime.fromisoformat(pending['first_file_timestamp'])
-                now = datetime.now()
-                age_hours = (now - oldest_time).total_seconds() / 3600
-                if age_hours > 24:
-                    logger.warning(f"CRITICAL: Oldest pending video is {age_hours:.1f} hours old!")
-            except Exception:
-                pass
+        for message, _ in critical_issues(results):
+            logger.warning(f"CRITICAL: {message}")
     
+    def flatten_results(self, results):
+        """Extract the key metrics of a results dict as one flat row (CSV columns in order)"""
+        row = {'timestamp': results['timestamp']}
+        for collector in COLLECTORS:
+            row.update(collector.row_values(results.get(collector.name) or {}))
+        return row
+
     def save_results(self, results):
         """Save the monitoring results to files"""
         try:
-            # 1. Save current status to JSON file (overwrite)
-            with open(DATA_FILE, 'w') as f:
+            # 1. Save current status to JSON file (overwrite, atomically so readers never see half a file)
+            tmp_file = DATA_FILE + '.tmp'
+            with open(tmp_file, 'w') as f:
                 json.dump(results, f, indent=2)
+            os.replace(tmp_file, DATA_FILE)
             logger.info(f"Current status saved to {DATA_FILE}")
             
             # 2. Append data to main historical CSV file (all records in one file)
             history_file = os.path.join(DATA_DIR, 'all_metrics_history.csv')
             file_exists = os.path.isfile(history_file)
             
-            # Extract key metrics for CSV
-            timestamp = results['timestamp']
-            
-            # APC Status
-            apc_status = results['apc_status'].get('status', 'unknown')
-            
-            # RTSP Recorder Status
-            rtsp_status = results['rtsp_recorder_status'].get('status', 'unknown')
-            
-            # eth0 Status
-            eth0 = results['eth0_status']
-            eth0_status = eth0.get('status', 'unknown')
-            eth0_ip = eth0.get('ip_address', 'unknown')
-            
-            # Root mount mode
-            root_mode = results['root_mount'].get('mode', 'unknown')
-            
-            # CPU Usage
-            cpu_usage = results['cpu_usage']
-            cpu_percent = cpu_usage.get('percent_used', -1)
-            if isinstance(cpu_percent, str):
-                cpu_percent = -1
-            
-            # Pending Videos
-            pending = results['pending_videos']
-            pending_count = pending.get('count', 0)
-            oldest_file = pending.get('first_file_timestamp', '')
-            newest_file = pending.get('latest_file_timestamp', '')
-            
-            # Disk Usage
-            disk_usage = results['disk_usage']
-            disk_percent = disk_usage.get('percent_used', -1)
-            if isinstance(disk_percent, str):
-                disk_percent = -1
-                
-            # RAM Usage
-            ram_usage = results['ram_usage']
-            ram_percent = ram_usage.get('percent_used', -1)
-            if isinstance(ram_percent, str):
-                ram_percent = -1
-                
-            # Temperature
-            temperature = results['system_temperature']
-            temp_c = temperature.get('temperature_c', -1)
-            if isinstance(temp_c, str):
-                temp_c = -1
-                
-            # Internet
-            internet = results['internet_connectivity']
-            internet_status = internet.get('status', 'unknown')
-            
+            row = self.flatten_results(results)
+            header_line = ','.join(row) + '\n'
+            row_line = ','.join(str(value) for value in row.values()) + '\n'
+
             # Write to CSV - single file with ALL historical data
             with open(history_file, 'a') as f:
                 # Write header if file doesn't exist
                 if not file_exists:
-                    f.write('timestamp,apc_status,rtsp_recorder_status,eth0_status,eth0_ip,root_mount_mode,cpu_percent,pending_videos,oldest_video,newest_video,disk_percent,ram_percent,temperature_c,internet_status\n')
+                    f.write(header_line)
                 
                 # Write data row
-                f.write(f'{timestamp},{apc_status},{rtsp_status},{eth0_status},{eth0_ip},{root_mode},{cpu_percent},{pending_count},{oldest_file},{newest_file},{disk_percent},{ram_percent},{temp_c},{internet_status}\n')
+                f.write(row_line)
                 
             # 3. Save daily reports in reports folder
             try:
                 # Extract date from timestamp (YYYY-MM-DD)
-                date_str = timestamp.split('T')[0]
+                date_str = row['timestamp'].split('T')[0]
                 
                 # Create reports directory
                 reports_dir = os.path.join(DATA_DIR, 'reports')
@@ -721,145 +1100,242 @@ class RaspberryPiMonitor:
                 with open(daily_report_file, 'a') as f:
                     # Write header if file doesn't exist
                     if not daily_file_exists:
-                        f.write('timestamp,apc_status,rtsp_recorder_status,eth0_status,eth0_ip,root_mount_mode,cpu_percent,pending_videos,oldest_video,newest_video,disk_percent,ram_percent,temperature_c,internet_status\n')
+                        f.write(header_line)
                     
                     # Write data row
-                    f.write(f'{timestamp},{apc_status},{rtsp_status},{eth0_status},{eth0_ip},{root_mode},{cpu_percent},{pending_count},{oldest_file},{newest_file},{disk_percent},{ram_percent},{temp_c},{internet_status}\n')
+                    f.write(row_line)
             except Exception as e:
                 logger.error(f"Error saving daily report: {str(e)}")
+
+            # 4. Spool the row for shipping to the central receiver
+            if self.shipper is not None:
+                self.shipper.add(row)
                 
         except Exception as e:
             logger.error(f"Failed to save monitoring results: {str(e)}")
             # Try to print to stdout as a last resort
             print(json.dumps(results, indent=2))
     
-    def monitor(self):
+    def ship_metrics(self, results):
+        """Send spooled metrics to the central receiver while the internet is up"""
+        if self.shipper is None:
+            return
+
+        if results.get('internet_connectivity', {}).get('status') != 'connected':
+            logger.info(f"Internet is down, {self.shipper.spool.pending_records()} samples kept in the spool")
+            return
+
+        if self.ship_wakeup is not None:
+            # The daemon flushes on the shipping thread, so pacing and retries never delay a sample
+            self.ship_wakeup.set()
+            return
+        self.flush_metrics()
+
+    def flush_metrics(self):
+        """Send what the spool holds now, within the shipper's flush limits"""
+        try:
+            self.shipper.flush()
+        except Exception as e:
+            logger.error(f"Failed to ship metrics: {str(e)}")
+
+    def ship_forever(self):
+        """Shipping thread: flush the spool each time a cycle finds the internet up"""
+        while True:
+            self.ship_wakeup.wait()
+            self.ship_wakeup.clear()
+            self.flush_metrics()
+
+    def update_analytics(self):
+        """Rebuild analytics.json from the daily reports if it is out of date"""
+        analytics_file = os.path.join(DATA_DIR, ANALYTICS_FILE_NAME)
+        try:
+            # Use the file age so the refresh interval also holds across one-shot runs,
+            # and check it before importing numpy so fresh runs stay cheap
+            if time.time() - os.path.getmtime(analytics_file) < ANALYTICS_REFRESH_SECONDS:
+                return
+        except OSError:
+            pass
+
+        pi_analytics = optional_module('pi_analytics')
+        if pi_analytics is None:
+            logger.warning("pi_analytics module not found, history analytics will not be published")
+            return
+        if pi_analytics.np is None:
+            return
+
+        try:
+            result = pi_analytics.write_analytics(DATA_DIR, ANALYTICS_DAYS)
+            logger.info(f"History analytics saved to {analytics_file} ({result.get('analysis_seconds', 0)}s)")
+        except Exception as e:
+            logger.error(f"Failed to update history analytics: {str(e)}")
+
+    def monitor(self, only=None, max_cost=None):
         """Run the monitoring process once"""
         logger.info("Starting monitoring checks...")
-        results = self.run_all_checks()
+        results = self.run_all_checks(only, max_cost)
+        if only or max_cost:
+            # A partial snapshot would overwrite status.json and add rows with placeholder values
+            logger.info("Selected checks completed, results not saved")
+            return results
         self.save_results(results)
+        self.ship_metrics(results)
+        self.update_analytics()
+        if self.recent is not None:
+            self.recent.append(self.flatten_results(results))
         logger.info("Monitoring checks completed")
         return results
 
+    def run_forever(self, interval=MONITOR_INTERVAL_SECONDS):
+        """Run the monitoring process every `interval` seconds, keeping recent history in memory"""
+        pi_history = optional_module('pi_history')
+        if pi_history is not None:
+            self.recent = pi_history.RingBuffer.for_interval(interval)
+            self.recent.warm_up(DATA_DIR)
+            try:
+                pi_history.serve_queries(self.recent)
+            except Exception as e:
+                logger.error(f"Failed to start recent history queries: {str(e)}")
+        else:
+            logger.warning("pi_history module not found, recent history will not be kept in memory")
+
+        if self.shipper is not None:
+            import threading
+            self.ship_wakeup = threading.Event()
+            threading.Thread(target=self.ship_forever, name='pi_monitor-shipper', daemon=True).start()
+
+        logger.info(f"Monitoring every {interval} seconds")
+        while True:
+            started = time.monotonic()
+            try:
+                self.monitor()
+            except Exception as e:
+                logger.error(f"Monitoring cycle failed: {str(e)}")
+            time.sleep(max(0, interval - (time.monotonic() - started)))
+
+def load_cached_snapshot(max_age=SNAPSHOT_MAX_AGE_SECONDS):
+    """Return (results, age in seconds) from the daemon's latest status.json, or None if it is missing or stale"""
+    for status_file in [DATA_FILE, '/tmp/pi_monitor/status.json']:
+        try:
+            with open(status_file) as f:
+                results = json.load(f)
+            age = (datetime.now() - datetime.fromisoformat(results['timestamp'])).total_seconds()
+        except (OSError, ValueError, KeyError, TypeError):
+            continue
+        if 0 <= age <= max_age:
+            return results, age
+        start_logging()
+        logger.info(f"Snapshot {status_file} is {age:.0f}s old, running checks instead")
+        return None
+    return None
+
+def print_summary(results, note=''):
+    """Print a summary of the results"""
+    print("\n===== Raspberry Pi 5 Monitoring Summary =====")
+    print(f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}{note}")
+    for collector in COLLECTORS:
+        if collector.name in results:
+            for line in collector.summary_lines(results[collector.name]):
+                print(line)
+    print("============================================")
+
+def replay(source, count, rate, output_dir=None, print_json=False):
+    """Stream recorded or synthetic snapshots through the alerting and storage paths"""
+    global DATA_DIR, DATA_FILE
+
+    pi_replay = optional_module('pi_replay')
+    pi_history = optional_module('pi_history')
+    if pi_replay is None:
+        print("ERROR: pi_replay module not found, it must sit next to pi_monitor.py", file=sys.stderr)
+        sys.exit(1)
+
+    import tempfile
+
+    # Never write replayed samples (or the alerts they raise) into the live metrics directory and log
+    DATA_DIR = output_dir or tempfile.mkdtemp(prefix='pi_monitor_replay_')
+    os.makedirs(DATA_DIR, exist_ok=True)
+    DATA_FILE = os.path.join(DATA_DIR, 'status.json')
+    replay_log = os.path.join(DATA_DIR, 'pi_monitor.log')
+    redirect_log_file(replay_log)
+
+    monitor = RaspberryPiMonitor(ship=False)
+    if pi_history is not None:
+        monitor.recent = pi_history.RingBuffer()
+
+    if source == 'synthetic':
+        snapshots = pi_replay.synthetic_snapshots()
+    else:
+        snapshots = pi_replay.snapshots_from_csv(source, loop=True)
+
+    logger.info(f"Replaying {count} snapshots from {source} into {DATA_DIR}")
+    report = pi_replay.run_replay(monitor, snapshots, count, rate)
+    report['source'] = source
+    report['output_dir'] = DATA_DIR
+
+    if print_json:
+        print(json.dumps(report, indent=2))
+    else:
+        pi_replay.print_report(report)
+        print(f"Replayed files written to {DATA_DIR} (log: {replay_log})")
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Raspberry Pi 5 Monitoring Service')
+    parser.add_argument('--daemon', action='store_true', help='keep running and collect every --interval seconds')
+    parser.add_argument('--interval', type=int, default=MONITOR_INTERVAL_SECONDS, help='seconds between collections in daemon mode')
+    parser.add_argument('--replay', metavar='SOURCE', help="replay a history CSV, or 'synthetic', through alerting and storage")
+    parser.add_argument('--count', type=int, default=10000, help='number of snapshots to replay')
+    parser.add_argument('--rate', type=float, default=0, help='replayed snapshots per second (0 = as fast as possible)')
+    parser.add_argument('--output-dir', help='where replayed files are written (default: a new temp directory)')
+    parser.add_argument('--json', action='store_true', help='print the replay report as JSON')
+    parser.add_argument('--only', metavar='CHECKS', help='comma-separated checks to run, e.g. cpu,temp (results are not saved)')
+    parser.add_argument('--max-cost', choices=COST_CLASSES, help='skip checks costlier than this (results are not saved)')
+    parser.add_argument('--summary', action='store_true', help="print the daemon's latest snapshot, running the checks only if it is stale")
+    parser.add_argument('--check', action='store_true', help='like --summary but only set the exit code')
+    parser.add_argument('--max-age', type=float, default=SNAPSHOT_MAX_AGE_SECONDS, help='seconds a snapshot stays fresh for --summary/--check')
+    args = parser.parse_args()
+
+    if args.replay:
+        replay(args.replay, args.count, args.rate, args.output_dir, args.json)
+        sys.exit(0)
+
+    if args.daemon:
+        RaspberryPiMonitor().run_forever(args.interval)
+
     try:
-        monitor = RaspberryPiMonitor()
-        results = monitor.monitor()
-        
-        # Print a summary of the results
-        print("\n===== Raspberry Pi 5 Monitoring Summary =====")
-        print(f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        
-        # APC Status
-        apc = results['apc_status']
-        print(f"APC Status: {apc.get('status', 'unknown')}")
-        
-        # RTSP Recorder Status
-        rtsp = results['rtsp_recorder_status']
-        print(f"RTSP Recorder Status: {rtsp.get('status', 'unknown')}")
-        
-        # eth0 Status
-        eth0 = results['eth0_status']
-        print(f"eth0 Status: {eth0.get('status', 'unknown')} | IP: {eth0.get('ip_address', 'unknown')}")
-        
-        # Root mount mode
-        root = results['root_mount']
-        print(f"Root Mount: {root.get('mode', 'unknown')}")
-        
-        # CPU Usage
-        cpu = results['cpu_usage']
-        if 'percent_used' in cpu:
-            print(f"CPU Usage: {cpu['percent_used']}% used")
-        else:
-            print(f"CPU Usage: {cpu.get('status', 'unknown')}")
-        
-        # Pending Videos
-        pending = results['pending_videos']
-        if 'count' in pending:
-            print(f"Pending Videos: {pending['count']} files")
-            if pending['count'] > 0:
-                print(f"  Oldest: {pending.get('first_file', 'unknown')} ({pending.get('first_file_timestamp', 'unknown')})")
-                print(f"  Newest: {pending.get('latest_file', 'unknown')} ({pending.get('latest_file_timestamp', 'unknown')})")
-        else:
-            print(f"Pending Videos: {pending.get('status', 'unknown')}")
-        
-        # Disk Usage
-        disk = results['disk_usage']
-        if 'percent_used' in disk:
-            print(f"Disk Usage: {disk['percent_used']}% used")
-        else:
-            print(f"Disk Usage: {disk.get('status', 'unknown')}")
-        
-        # RAM Usage
-        ram = results['ram_usage']
-        if 'percent_used' in ram:
-            print(f"RAM Usage: {ram['percent_used']}% used")
-        else:
-            print(f"RAM Usage: {ram.get('status', 'unknown')}")
-        
-        # System Temperature
-        temp = results['system_temperature']
-        if 'temperature_c' in temp:
-            print(f"System Temperature: {temp['temperature_c']}°C")
+        only = [name.strip() for name in args.only.split(',') if name.strip()] if args.only else None
+        try:
+            resolve_collectors(only, args.max_cost)
+        except ValueError as e:
+            parser.error(str(e))
+
+        # Fast path: reuse the daemon's latest snapshot if it is fresh enough
+        cached = None
+        if (args.summary or args.check) and not (only or args.max_cost):
+            cached = load_cached_snapshot(args.max_age)
+
+        if cached is not None:
+            results, age = cached
+            note = f" (snapshot from {results['timestamp'][:19].replace('T', ' ')}, {age:.0f}s old)"
         else:
-            print(f"System Temperature: {temp.get('status', 'unknown')}")
-        
-        # Internet
-        net = results['internet_connectivity']
-        print(f"Internet: {net.get('status', 'unknown')}")
-        print("============================================")
+            monitor = RaspberryPiMonitor()
+            results = monitor.monitor(only, args.max_cost)
+            note = ''
+
+        if not args.check:
+            print_summary(results, note)
         
         # Exit with status code 1 if any critical service is stopped or failure condition
-        critical_issues = False
-        
-        if apc.get('status') == 'stopped':
-            print("WARNING: APC service is stopped!")
-            critical_issues = True
-            
-        if rtsp.get('status') == 'stopped':
-            print("WARNING: RTSP Recorder service is stopped!")
-            critical_issues = True
-            
-        if eth0.get('status') == 'down':
-            print("WARNING: eth0 interface is DOWN!")
-            critical_issues = True
-            
-        if root.get('mode') == 'ro':
-            print("WARNING: Root filesystem is mounted READ-ONLY!")
-            critical_issues = True
-            
-        # Check if too many pending videos (>100)
-        if 'count' in pending and isinstance(pending['count'], int) and pending['count'] > 100:
-            print(f"WARNING: Too many pending videos: {pending['count']} files!")
-            critical_issues = True
-            
-        # Check if oldest pending video is too old (>24 hours)
-        if 'first_file_timestamp' in pending and pending['first_file_timestamp']:
-            try:
-                oldest_time = datetime.fromisoformat(pending['first_file_timestamp'])
-                now = datetime.now()
-                age_hours = (now - oldest_time).total_seconds() / 3600
-                if age_hours > 24:
-                    print(f"WARNING: Oldest pending video is {age_hours:.1f} hours old!")
-                    critical_issues = True
-            except Exception:
-                pass
-        
-        if critical_issues:
-            sys.exit(1)
-            
-    except Exception as e:
-        logger.error(f"Critical error in monitoring service: {str(e)}")
-        print(f"Critical error: {str(e)}", file=sys.stderr)
-            
-        if root.get('mode') == 'ro':
-            print("WARNING: Root filesystem is mounted READ-ONLY!")
-            critical_issues = True
+        critical = False
+        for message, fails in critical_issues(results):
+            if fails:
+                if not args.check:
+                    print(f"WARNING: {message}")
+                critical = True
         
-        if critical_issues:
+        if critical:
             sys.exit(1)
             
     except Exception as e:
+        start_logging()
         logger.error(f"Critical error in monitoring service: {str(e)}")
         print(f"Critical error: {str(e)}", file=sys.stderr)
         sys.exit(1)
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Raspberry Pi 5 Monitoring - Replay and load simulation
+
+Streams snapshots through the alerting and storage paths of pi_monitor.py
+without a live Pi:
+1. Snapshots are rebuilt from all_metrics_history.csv (or a daily report),
+   or generated synthetically
+2. Each snapshot goes through check_critical_conditions, save_results and,
+   when available, the in-memory ring buffer
+3. Snapshots are paced to a target rate (e.g. 10000/s) or sent as fast as
+   possible, and the throughput and latency of each stage are reported
+
+Files and the log are written to a scratch directory, never to the live
+metrics directory or /var/log, and metric shipping is disabled. Run it through pi_monitor.py:
+    pi_monitor.py --replay /var/www/camera-dashboard/metrics/all_metrics_history.csv --rate 10000
+    pi_monitor.py --replay synthetic --count 100000 --rate 0
+"""
+
+import csv
+import math
+import time
+import random
+from array import array
+from datetime import datetime, timedelta
+
+# Status values the synthetic generator draws from (mostly healthy)
+SERVICE_STATES = ['running'] * 98 + ['stopped', 'timeout']
+INTERNET_STATES = ['connected'] * 97 + ['disconnected'] * 3
+
+LATENCY_PERCENTILES = [50, 95, 99]
+
+
+def _number(value, cast=float):
+    """Parse a CSV number, returning None for the -1 'not collected' marker"""
+    try:
+        number = cast(float(value))
+    except (TypeError, ValueError):
+        return None
+    return None if number == -1 else number
+
+
+def _optional(value):
+    return None if value in (None, '', 'None') else value
+
+
+def snapshot_from_row(row):
+    """Rebuild a run_all_checks() style results dict from a saved CSV row"""
+    def percent(key):
+        value = _number(row.get(key))
+        return {'status': 'error', 'details': 'not collected'} if value is None else {'percent_used': value}
+
+    temp_c = _number(row.get('temperature_c'))
+    pending_count = _number(row.get('pending_videos'), int)
+
+    return {
+        'timestamp': row['timestamp'],
+        'apc_status': {'status': row.get('apc_status', 'unknown')},
+        'rtsp_recorder_status': {'status': row.get('rtsp_recorder_status', 'unknown')},
+        'eth0_status': {'status': row.get('eth0_status', 'unknown'), 'ip_address': row.get('eth0_ip', 'unknown')},
+        'root_mount': {'mode': row.get('root_mount_mode', 'unknown')},
+        'cpu_usage': percent('cpu_percent'),
+        'pending_videos': {
+            'count': pending_count or 0,
+            'first_file_timestamp': _optional(row.get('oldest_video')),
+            'latest_file_timestamp': _optional(row.get('newest_video')),
+        },
+        'disk_usage': percent('disk_percent'),
+        'ram_usage': percent('ram_percent'),
+        'system_temperature': {'status': 'error', 'details': 'not collected'} if temp_c is None else {
+            'temperature_c': temp_c,
+            'temperature_f': round((temp_c * 9/5) + 32, 1)
+        },
+        'internet_connectivity': {'status': row.get('internet_status', 'unknown')},
+    }
+
+
+def _shift(value, offset):
+    return (datetime.fromisoformat(value) + offset).isoformat() if value else value
+
+
+def snapshots_from_csv(path, loop=False, interval_seconds=60):
+    """Yield snapshots rebuilt from a history CSV, optionally looping over it forever
+
+    Each further pass is shifted to start one interval after the previous one
+    ended, so timestamps keep increasing (the ring buffer and the daily
+    reports both rely on time order).
+    """
+    offset = timedelta(0)
+    while True:
+        first = last = None
+        with open(path, newline='') as f:
+            for row in csv.DictReader(f):
+                if not row.get('timestamp'):
+                    continue
+                try:
+                    timestamp = datetime.fromisoformat(row['timestamp'])
+                except ValueError:
+                    continue
+                first = first or timestamp
+                last = timestamp
+                snapshot = snapshot_from_row(row)
+                if offset:
+                    snapshot['timestamp'] = (timestamp + offset).isoformat()
+                    pending = snapshot['pending_videos']
+                    pending['first_file_timestamp'] = _shift(pending['first_file_timestamp'], offset)
+                    pending['latest_file_timestamp'] = _shift(pending['latest_file_timestamp'], offset)
+                yield snapshot
+        if not loop or first is None:
+            return
+        offset += last - first + timedelta(seconds=interval_seconds)
+
+
+def synthetic_snapshots(seed=None, interval_seconds=60):
+    """Yield an endless stream of plausible snapshots (random walks plus occasional faults)"""
+    rng = random.Random(seed)
+    timestamp = datetime.now()
+    cpu, ram, disk, temp, pending = 20.0, 40.0, 60.0, 55.0, 5
+
+    while True:
+        cpu = min(100.0, max(0.0, cpu + rng.gauss(0, 5)))
+        ram = min(100.0, max(5.0, ram + rng.gauss(0, 1)))
+        disk = min(100.0, max(10.0, disk + rng.gauss(0.001, 0.05)))
+        temp = min(95.0, max(35.0, temp + rng.gauss(0, 0.8)))
+        pending = max(0, pending + rng.choice([-1, 0, 0, 1]))
+        oldest = (timestamp - timedelta(hours=rng.uniform(0, 30))).isoformat() if pending else None
+
+        yield {
+            'timestamp': timestamp.isoformat(),
+            'apc_status': {'status': rng.choice(SERVICE_STATES)},
+            'rtsp_recorder_status': {'status': rng.choice(SERVICE_STATES)},
+            'eth0_status': {'status': 'up' if rng.random() > 0.01 else 'down', 'ip_address': '192.168.1.100'},
+            'root_mount': {'mode': 'rw' if rng.random() > 0.001 else 'ro'},
+            'cpu_usage': {'percent_used': round(cpu, 1)},
+            'pending_videos': {
+                'count': pending,
+                'first_file_timestamp': oldest,
+                'latest_file_timestamp': timestamp.isoformat() if pending else None,
+            },
+            'disk_usage': {'percent_used': round(disk, 1)},
+            'ram_usage': {'percent_used': round(ram, 1)},
+            'system_temperature': {'temperature_c': round(temp, 1), 'temperature_f': round((temp * 9/5) + 32, 1)},
+            'internet_connectivity': {'status': rng.choice(INTERNET_STATES)},
+        }
+        timestamp += timedelta(seconds=interval_seconds)
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(math.ceil(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarise_latencies(latencies):
+    """Latency summary in microseconds for one stage"""
+    values = sorted(latencies)
+    total = sum(values)
+    summary = {
+        'count': len(values),
+        'total_seconds': round(total / 1e6, 3),
+        'mean_us': round(total / len(values), 1) if values else 0.0,
+        'max_us': round(values[-1], 1) if values else 0.0,
+    }
+    for pct in LATENCY_PERCENTILES:
+        summary[f"p{pct}_us"] = round(_percentile(values, pct), 1)
+    return summary
+
+
+def run_replay(monitor, snapshots, count, rate=0):
+    """Push `count` snapshots through the monitor's stages, paced to `rate` per second (0 = unpaced)
+
+    Returns a report with overall throughput and per-stage latency.
+    """
+    stages = [
+        ('check_critical_conditions', monitor.check_critical_conditions),
+        ('save_results', monitor.save_results),
+    ]
+    if getattr(monitor, 'recent', None) is not None:
+        stages.append(('recent_history', lambda results: monitor.recent.append(monitor.flatten_results(results))))
+
+    latencies = {name: array('d') for name, _ in stages}
+    perf_counter = time.perf_counter
+    period = 1.0 / rate if rate else 0.0
+    max_lag = 0.0
+    processed = 0
+
+    started = perf_counter()
+    for snapshot in snapshots:
+        if processed >= count:
+            break
+
+        if period:
+            due = started + processed * period
+            now = perf_counter()
+            if due > now:
+                # Sleep only for meaningful waits, short ones are cheaper to spin through
+                if due - now > 0.001:
+                    time.sleep(due - now)
+                while perf_counter() < due:
+                    pass
+            else:
+                max_lag = max(max_lag, now - due)
+
+        for name, stage in stages:
+            stage_started = perf_counter()
+            stage(snapshot)
+            latencies[name].append((perf_counter() - stage_started) * 1e6)
+        processed += 1
+
+    elapsed = perf_counter() - started
+
+    return {
+        'samples': processed,
+        'elapsed_seconds': round(elapsed, 3),
+        'target_rate': rate or None,
+        'achieved_rate': round(processed / elapsed, 1) if elapsed > 0 else None,
+        'max_lag_ms': round(max_lag * 1000, 2),
+        'stages': {name: summarise_latencies(values) for name, values in latencies.items()},
+    }
+
+
+def print_report(report):
+    """Print a replay report as a small table"""
+    print("\n===== Replay Summary =====")
+    print(f"Samples: {report['samples']} in {report['elapsed_seconds']}s")
+    target = report['target_rate'] or 'unpaced'
+    print(f"Throughput: {report['achieved_rate']}/s (target: {target}) | max lag behind schedule: {report['max_lag_ms']} ms")
+    print(f"{'Stage':<28}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>12}  (us)")
+    for name, stats in report['stages'].items():
+        print(f"{name:<28}{stats['mean_us']:>10}{stats['p50_us']:>10}{stats['p95_us']:>10}{stats['p99_us']:>10}{stats['max_us']:>12}")
+    print("==========================")
@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+"""
+Raspberry Pi 5 Monitoring - Store-and-forward metric shipping
+
+Every sample saved by pi_monitor.py is appended to a durable on-disk spool.
+When the internet is reachable the spool is drained to a central receiver:
+1. Samples are sent in gzip-compressed JSON batches
+2. All batches of a flush share one keep-alive HTTP connection
+3. Failed sends back off exponentially with jitter (persisted across restarts)
+4. Each flush is capped in batches, bytes/second and wall time, so a long
+   outage does not turn into a burst that saturates the uplink
+5. The spool is bounded; the oldest samples are dropped first when it is full
+6. Batches the receiver refuses outright (4xx) are set aside, so one bad
+   segment does not hold up everything spooled after it
+
+The receiver URL is taken from the PI_MONITOR_SHIP_URL environment variable.
+For testing, a stand-in receiver can be started with:
+    pi_shipper.py --receiver 8080
+and the monitor pointed at it with PI_MONITOR_SHIP_URL=http://127.0.0.1:8080/ingest
+"""
+
+import os
+import sys
+import gzip
+import json
+import time
+import random
+import socket
+import logging
+import threading
+import argparse
+import http.client
+from datetime import datetime
+from urllib.parse import urlsplit
+
+logger = logging.getLogger('pi_monitor.shipper')
+
+# Spool location (not under the web root, the samples are not public)
+DEFAULT_SPOOL_DIR = '/var/lib/pi_monitor/spool'
+
+# Spool limits
+SPOOL_MAX_BYTES = 50 * 1024 * 1024  # Oldest segments are dropped beyond this
+SEGMENT_MAX_RECORDS = 500  # Samples per segment, one segment is sent as one batch
+BATCH_INTERVAL = 5 * 60  # While online, send the active segment once its oldest sample is this old
+
+# Flush limits (backpressure)
+MAX_BATCHES_PER_FLUSH = 20
+MAX_UPLOAD_BYTES_PER_SECOND = 64 * 1024  # Compressed bytes, keeps headroom on slow uplinks
+FLUSH_TIME_BUDGET = 20  # Seconds a single flush may take
+
+# Retry policy
+RETRY_BASE_SECONDS = 30
+RETRY_MAX_SECONDS = 30 * 60
+
+HTTP_TIMEOUT = 10
+
+ACTIVE_SEGMENT = 'active.jsonl'
+STATE_FILE = 'state.json'
+REJECTED_DIR = 'rejected'  # Segments the receiver refused with a 4xx, kept for inspection
+REJECTED_MAX_SEGMENTS = 10
+
+# 4xx responses that are worth retrying; any other 4xx means the batch itself is bad
+RETRYABLE_CLIENT_ERRORS = (408, 429)
+
+
+class MetricSpool:
+    """Durable, bounded on-disk queue of samples
+
+    Samples are appended as JSON lines to active.jsonl. When it is full, or
+    its oldest sample is BATCH_INTERVAL old at flush time, it is sealed by
+    renaming it to <time_ns>.jsonl. Sealed segments are sent oldest first and
+    deleted once acknowledged; segments the receiver refuses are moved to
+    rejected/. The spool is shared by the sampling thread (append) and the
+    shipping thread (flush), so changes to its files are made under a lock.
+    """
+
+    def __init__(self, spool_dir=DEFAULT_SPOOL_DIR, max_bytes=SPOOL_MAX_BYTES, segment_max_records=SEGMENT_MAX_RECORDS):
+        self.spool_dir = spool_dir
+        self.max_bytes = max_bytes
+        self.segment_max_records = segment_max_records
+        self.active_file = os.path.join(spool_dir, ACTIVE_SEGMENT)
+        self.rejected_dir = os.path.join(spool_dir, REJECTED_DIR)
+        self.lock = threading.Lock()
+        os.makedirs(spool_dir, exist_ok=True)
+        self._repair_active()
+        self.active_records = self._count_lines(self.active_file)
+        # Samples per sealed segment, counted once so pending_records() does not re-read the spool
+        self.segment_records = {path: self._count_lines(path) for path in self._list_segments()}
+
+    @staticmethod
+    def _count_lines(path):
+        try:
+            with open(path, 'rb') as f:
+                return sum(1 for _ in f)
+        except FileNotFoundError:
+            return 0
+
+    def _repair_active(self):
+        """Cut a partial last line (left by a power cut during append) off the active segment"""
+        try:
+            with open(self.active_file, 'rb+') as f:
+                f.seek(0, os.SEEK_END)
+                size = f.tell()
+                if size == 0:
+                    return
+                f.seek(size - 1)
+                if f.read(1) == b'\n':
+                    return
+                f.seek(0)
+                keep = f.read().rfind(b'\n') + 1
+                f.truncate(keep)
+            logger.warning(f"Dropped a partial sample ({size - keep} bytes) from the end of {self.active_file}")
+        except FileNotFoundError:
+            pass
+
+    def append(self, record):
+        """Append one sample and make sure it reaches the disk"""
+        line = json.dumps(record, separators=(',', ':')) + '\n'
+        with self.lock:
+            with open(self.active_file, 'a') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self.active_records += 1
+
+            if self.active_records >= self.segment_max_records:
+                self._seal()
+            self._enforce_limit()
+
+    def active_age(self):
+        """Seconds since the oldest sample in the active segment was taken"""
+        try:
+            with open(self.active_file) as f:
+                first = json.loads(f.readline())
+            return (datetime.now() - datetime.fromisoformat(first['timestamp'])).total_seconds()
+        except (OSError, ValueError, KeyError, TypeError):
+            # No timestamp to go by, treat the segment as due
+            return float('inf')
+
+    def seal(self):
+        """Close the active segment so it can be sent"""
+        with self.lock:
+            self._seal()
+
+    def _seal(self):
+        if self.active_records == 0:
+            return
+        path = os.path.join(self.spool_dir, f"{time.time_ns()}.jsonl")
+        os.replace(self.active_file, path)
+        self.segment_records[path] = self.active_records
+        self.active_records = 0
+
+    def _list_segments(self):
+        names = [name for name in os.listdir(self.spool_dir) if name.endswith('.jsonl') and name != ACTIVE_SEGMENT]
+        names.sort(key=lambda name: int(name.split('.')[0]))
+        return [os.path.join(self.spool_dir, name) for name in names]
+
+    def segments(self):
+        """Sealed segments, oldest first"""
+        with self.lock:
+            return self._list_segments()
+
+    def read_segment(self, segment):
+        """Lines of a sealed segment, or None if it was dropped in the meantime"""
+        try:
+            with open(segment, 'rb') as f:
+                return f.read().splitlines()
+        except FileNotFoundError:
+            return None
+
+    def remove(self, segment):
+        """Delete a segment once it has been acknowledged"""
+        with self.lock:
+            self.segment_records.pop(segment, None)
+            try:
+                os.remove(segment)
+            except FileNotFoundError:
+                pass
+
+    def reject(self, segment):
+        """Move a segment the receiver refused out of the queue, keeping the newest few for inspection"""
+        with self.lock:
+            self.segment_records.pop(segment, None)
+            os.makedirs(self.rejected_dir, exist_ok=True)
+            try:
+                os.replace(segment, os.path.join(self.rejected_dir, os.path.basename(segment)))
+            except FileNotFoundError:
+                return
+            rejected = sorted(os.listdir(self.rejected_dir), key=lambda name: int(name.split('.')[0]))
+            for name in rejected[:-REJECTED_MAX_SEGMENTS]:
+                os.remove(os.path.join(self.rejected_dir, name))
+
+    def _enforce_limit(self):
+        """Drop the oldest sealed segments while the spool is over its size limit"""
+        segments = self._list_segments()
+        sizes = [os.path.getsize(path) for path in segments]
+        total = sum(sizes)
+        if os.path.isfile(self.active_file):
+            total += os.path.getsize(self.active_file)
+
+        dropped = 0
+        for path, size in zip(segments, sizes):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            self.segment_records.pop(path, None)
+            total -= size
+            dropped += 1
+
+        if dropped:
+            logger.warning(f"Metric spool over {self.max_bytes} bytes, dropped {dropped} oldest segment(s)")
+
+    def pending_records(self):
+        """Number of samples waiting to be sent"""
+        with self.lock:
+            return self.active_records + sum(self.segment_records.values())
+
+
+class MetricShipper:
+    """Sends spooled samples to the receiver over a pooled keep-alive connection"""
+
+    def __init__(self, url, spool_dir=DEFAULT_SPOOL_DIR, device_id=None):
+        self.url = urlsplit(url)
+        self.path = self.url.path or '/'
+        if self.url.query:
+            self.path += '?' + self.url.query
+        self.device_id = device_id or socket.gethostname()
+        self.spool = MetricSpool(spool_dir)
+        self.state_file = os.path.join(spool_dir, STATE_FILE)
+        self.state = self._load_state()
+        self.connection = None
+
+    def _load_state(self):
+        try:
+            with open(self.state_file) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {'failures': 0, 'next_attempt': 0}
+
+    def _save_state(self):
+        try:
+            tmp_file = self.state_file + '.tmp'
+            with open(tmp_file, 'w') as f:
+                json.dump(self.state, f)
+            os.replace(tmp_file, self.state_file)
+        except Exception as e:
+            logger.error(f"Failed to save shipper state: {str(e)}")
+
+    def _connect(self):
+        """Return the pooled connection, opening it if needed"""
+        if self.connection is None:
+            connection_class = http.client.HTTPSConnection if self.url.scheme == 'https' else http.client.HTTPConnection
+            self.connection = connection_class(self.url.hostname, self.url.port, timeout=HTTP_TIMEOUT)
+        return self.connection
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def _backoff(self, retry_after=None):
+        """Schedule the next attempt with exponential backoff and full jitter"""
+        self.state['failures'] += 1
+        delay = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * (2 ** (self.state['failures'] - 1)))
+        delay = random.uniform(0, delay)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        self.state['next_attempt'] = time.time() + delay
+        logger.warning(f"Metric shipping failed {self.state['failures']} time(s), next attempt in {delay:.0f}s")
+
+    def add(self, record):
+        """Spool one sample"""
+        try:
+            self.spool.append(record)
+        except Exception as e:
+            logger.error(f"Failed to spool metrics: {str(e)}")
+
+    def send_batch(self, segment):
+        """Send one sealed segment, returning (HTTP status, compressed size, retry-after seconds)
+
+        The status is None when there was nothing to send (the segment was
+        dropped meanwhile, or none of its lines were valid samples).
+        """
+        lines = self.spool.read_segment(segment)
+        if lines is None:
+            return None, 0, None
+
+        records = []
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                json.loads(line)
+            except ValueError:
+                # e.g. a sample cut short by a power cut, it would make the whole batch unparseable
+                continue
+            records.append(line)
+        skipped = sum(1 for line in lines if line.strip()) - len(records)
+        if skipped:
+            logger.warning(f"Skipped {skipped} corrupt sample(s) in {os.path.basename(segment)}")
+        if not records:
+            return None, 0, None
+
+        body = b'{"device":' + json.dumps(self.device_id).encode() + b',"records":[' + b','.join(records) + b']}'
+        payload = gzip.compress(body)
+        headers = {
+            'Content-Type': 'application/json',
+            'Content-Encoding': 'gzip',
+            # Lets the receiver drop a batch it already stored if our ack was lost
+            'X-Batch-Id': f"{self.device_id}-{os.path.basename(segment).split('.')[0]}",
+            'Connection': 'keep-alive',
+        }
+
+        for attempt in range(2):
+            connection = self._connect()
+            try:
+                connection.request('POST', self.path, body=payload, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                break
+            except (http.client.HTTPException, OSError):
+                # A pooled connection may have been closed by the server, reconnect once
+                self.close()
+                if attempt == 1:
+                    raise
+
+        if response.will_close:
+            self.close()
+
+        if 200 <= response.status < 300:
+            return response.status, len(payload), None
+
+        retry_after = None
+        if response.status in (429, 503):
+            try:
+                retry_after = float(response.getheader('Retry-After', ''))
+            except ValueError:
+                pass
+        logger.warning(f"Receiver rejected metric batch: HTTP {response.status}")
+        return response.status, len(payload), retry_after
+
+    def flush(self):
+        """Send spooled batches within the flush limits, returning the number of batches sent"""
+        if time.time() < self.state.get('next_attempt', 0):
+            return 0
+
+        if self.spool.active_records and self.spool.active_age() >= BATCH_INTERVAL:
+            self.spool.seal()
+        started = time.monotonic()
+        sent = 0
+        sent_bytes = 0
+
+        try:
+            for segment in self.spool.segments()[:MAX_BATCHES_PER_FLUSH]:
+                elapsed = time.monotonic() - started
+                if elapsed > FLUSH_TIME_BUDGET:
+                    break
+
+                # Pace uploads so the average rate stays under the uplink budget
+                ahead = sent_bytes / MAX_UPLOAD_BYTES_PER_SECOND - elapsed
+                if ahead > 0:
+                    time.sleep(ahead)
+
+                try:
+                    status, size, retry_after = self.send_batch(segment)
+                except (http.client.HTTPException, OSError) as e:
+                    logger.warning(f"Could not reach metric receiver: {str(e)}")
+                    self._backoff()
+                    break
+
+                if status is None:
+                    # Nothing left to send in this segment
+                    self.spool.remove(segment)
+                    continue
+
+                if 400 <= status < 500 and status not in RETRYABLE_CLIENT_ERRORS:
+                    # Resending the same batch would fail the same way and block everything behind it
+                    logger.error(f"Receiver refused {os.path.basename(segment)} (HTTP {status}), moved to {self.spool.rejected_dir}")
+                    self.spool.reject(segment)
+                    continue
+
+                if not 200 <= status < 300:
+                    self._backoff(retry_after)
+                    break
+
+                self.spool.remove(segment)
+                sent += 1
+                sent_bytes += size
+                self.state['failures'] = 0
+                self.state['next_attempt'] = 0
+        finally:
+            self._save_state()
+
+        if sent:
+            logger.info(f"Shipped {sent} metric batch(es), {sent_bytes} bytes compressed")
+        return sent
+
+
+def run_receiver(port):
+    """Stand-in receiver that accepts batches and prints what it got"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    seen_batches = set()
+
+    class ReceiverHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # Keep-alive
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            try:
+                if self.headers.get('Content-Encoding') == 'gzip':
+                    body = gzip.decompress(body)
+                batch = json.loads(body)
+            except (OSError, ValueError) as e:
+                print(f"{self.headers.get('X-Batch-Id')}: rejected, {str(e)}")
+                self.send_response(400)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            batch_id = self.headers.get('X-Batch-Id')
+            duplicate = batch_id in seen_batches
+            seen_batches.add(batch_id)
+            print(f"{batch_id}: {len(batch['records'])} records from {batch['device']}{' (duplicate)' if duplicate else ''}")
+            self.send_response(204)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    print(f"Receiving metric batches on port {port}")
+    ThreadingHTTPServer(('', port), ReceiverHandler).serve_forever()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='Ship spooled Raspberry Pi metrics')
+    parser.add_argument('--spool-dir', default=DEFAULT_SPOOL_DIR, help='spool directory used by pi_monitor.py')
+    parser.add_argument('--url', default=os.environ.get('PI_MONITOR_SHIP_URL'), help='receiver URL')
+    parser.add_argument('--receiver', type=int, metavar='PORT', help='run a stand-in receiver instead of shipping')
+    args = parser.parse_args()
+
+    if args.receiver:
+        run_receiver(args.receiver)
+        sys.exit(0)
+
+    if not args.url:
+        print("ERROR: no receiver URL, set PI_MONITOR_SHIP_URL or pass --url", file=sys.stderr)
+        sys.exit(1)
+
+    shipper = MetricShipper(args.url, args.spool_dir)
+    print(f"Pending samples: {shipper.spool.pending_records()}")
+    shipper.flush()
+    shipper.close()
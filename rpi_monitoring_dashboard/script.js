@@ -494,6 +494,7 @@ let historicalData = [];
 let charts = {};
 let loadedFiles = [];
 let systemEvents = [];
+let historyAnalytics = null;
 
 // Event detection thresholds (configurable)
 const THRESHOLDS = {
@@ -508,6 +509,26 @@ const THRESHOLDS = {
 // Expected data collection interval in minutes
 const EXPECTED_INTERVAL_MINUTES = 1;
 
+// A gap is reported when two samples are further apart than this many intervals (same as pi_analytics.py)
+const GAP_TOLERANCE_INTERVALS = 1.5;
+
+// Uptime and incidents precomputed by pi_analytics.py for the default (last 30 days) view
+const ANALYTICS_FILE = 'analytics.json';
+
+// Incident types in analytics.json -> events shown when an incident starts and ends
+// (the same events analyzeSystemEvents raises; critical levels recover through their high incident)
+const INCIDENT_EVENTS = {
+    apc_down: { type: 'critical', icon: '⚡', message: 'APC went offline', recovery: 'APC came back online' },
+    rtsp_recorder_down: { type: 'warning', icon: '📹', message: 'RTSP service went down', recovery: 'RTSP service restored' },
+    internet_down: { type: 'warning', icon: '🌐', message: 'Internet connectivity lost', recovery: 'Internet connectivity restored' },
+    temperature_c_high: { type: 'warning', icon: '⚠', message: 'Temperature is high', recovery: 'Temperature returned to normal', critical: 'temperature_c_critical' },
+    temperature_c_critical: { type: 'critical', icon: '🔥', message: 'Temperature reached critical level', recovery: null },
+    ram_percent_high: { type: 'warning', icon: '⚠', message: 'RAM usage is high', recovery: 'RAM usage returned to normal', critical: 'ram_percent_critical' },
+    ram_percent_critical: { type: 'critical', icon: '💾', message: 'RAM usage reached critical level', recovery: null },
+    disk_percent_high: { type: 'warning', icon: '⚠', message: 'Disk usage is high', recovery: 'Disk usage returned to normal', critical: 'disk_percent_critical' },
+    disk_percent_critical: { type: 'critical', icon: '💽', message: 'Disk usage reached critical level', recovery: null }
+};
+
 async function loadAllHistoricalData() {
     const folderPath = document.getElementById('csvFolder').value.trim() || './metrics/';
     const startDate = document.getElementById('startDate').value;
@@ -518,6 +539,7 @@ async function loadAllHistoricalData() {
     historicalData = [];
     loadedFiles = [];
     systemEvents = [];
+    historyAnalytics = null;
 
     try {
         // Generate potential file names based on date range or last 30 days
@@ -564,8 +586,15 @@ async function loadAllHistoricalData() {
             throw new Error('No data found for the selected date range');
         }
 
-        // Analyze events
-        analyzeSystemEvents();
+        // Use the precomputed analytics for the default range, analyze events here otherwise
+        if (!startDate && !endDate) {
+            historyAnalytics = await loadAnalytics(folderPath);
+        }
+        if (historyAnalytics) {
+            systemEvents = eventsFromAnalytics(historyAnalytics);
+        } else {
+            analyzeSystemEvents();
+        }
 
         displayHistoricalData();
         showMessage(`Successfully loaded ${historicalData.length} records from ${loadedCount} files: ${loadedFiles.join(', ')}`, 'success');
@@ -677,9 +706,88 @@ async function loadCSVFile(filePath) {
     }
 }
 
+async function loadAnalytics(folderPath) {
+    try {
+        const response = await fetch(folderPath + ANALYTICS_FILE + '?t=' + new Date().getTime());
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}`);
+        }
+        const analytics = await response.json();
+        if (!analytics.records || !analytics.uptime_percent || !analytics.incidents) {
+            throw new Error('no analysed records');
+        }
+        return analytics;
+    } catch (error) {
+        // Not published yet (or numpy missing on the Pi), fall back to analyzing the rows here
+        console.log(`Could not load ${ANALYTICS_FILE}: ${error.message}`);
+        return null;
+    }
+}
+
+function gapEvent(start, durationMinutes, missedSamples) {
+    return {
+        timestamp: start,
+        type: 'info',
+        icon: '⏸',
+        message: 'Data collection gap',
+        value: `${durationMinutes} min, ${missedSamples} samples missed`
+    };
+}
+
+function eventsFromAnalytics(analytics) {
+    const events = [];
+
+    // A jump straight to the critical level only raises the critical event, as in analyzeSystemEvents
+    const criticalStarts = new Set(analytics.incidents.map(incident => `${incident.type}@${incident.start}`));
+
+    analytics.incidents.forEach(incident => {
+        const kind = INCIDENT_EVENTS[incident.type];
+        if (!kind) return;
+
+        // A run already in progress when the range starts has no transition into it, only out of it
+        const started = !incident.open_at_start;
+        if (started && (!kind.critical || !criticalStarts.has(`${kind.critical}@${incident.start}`))) {
+            events.push({
+                timestamp: new Date(incident.start),
+                type: kind.type,
+                icon: kind.icon,
+                message: kind.message,
+                value: incident.end ? `Lasted ${incident.duration_minutes} min` : 'Ongoing'
+            });
+        }
+        if (incident.end && kind.recovery) {
+            events.push({
+                timestamp: new Date(incident.end),
+                type: 'recovery',
+                icon: '✓',
+                message: kind.recovery,
+                value: `After ${incident.duration_minutes} min`
+            });
+        }
+    });
+
+    (analytics.gaps || []).forEach(gap => {
+        events.push(gapEvent(new Date(gap.start), gap.duration_minutes, gap.missed_samples));
+    });
+
+    // Sort events by timestamp (most recent first)
+    return events.sort((a, b) => b.timestamp - a.timestamp);
+}
+
 function calculateUptimeStats() {
     if (historicalData.length === 0) return {};
 
+    if (historyAnalytics) {
+        const uptime = historyAnalytics.uptime_percent;
+        return {
+            systemUptime: uptime.system || 0,
+            apcUptime: uptime.apc || 0,
+            rtspUptime: uptime.rtsp_recorder || 0,
+            internetUptime: uptime.internet || 0,
+            totalHours: historyAnalytics.total_hours
+        };
+    }
+
     const firstTimestamp = historicalData[0].timestamp;
     const lastTimestamp = historicalData[historicalData.length - 1].timestamp;
     const totalTimeRange = lastTimestamp - firstTimestamp; // in milliseconds
@@ -748,6 +856,15 @@ function analyzeSystemEvents() {
         const row = historicalData[i];
         const prev = previousRow;
 
+        // Data collection gaps (same rule as pi_analytics.py)
+        if (prev) {
+            const intervalMs = EXPECTED_INTERVAL_MINUTES * 60 * 1000;
+            const gapMs = row.timestamp - prev.timestamp;
+            if (gapMs > intervalMs * GAP_TOLERANCE_INTERVALS) {
+                systemEvents.push(gapEvent(prev.timestamp, (gapMs / 60000).toFixed(1), Math.round(gapMs / intervalMs) - 1));
+            }
+        }
+
         // System offline/online events (APC status changes)
         if (prev) {
             if (prev.apc_status === 'running' && row.apc_status !== 'running') {
@@ -788,7 +905,7 @@ function analyzeSystemEvents() {
             }
 
             // Internet status changes
-            if (prev.internet_status === 'connnected' && row.internet_status !== 'connected') {
+            if (prev.internet_status === 'connected' && row.internet_status !== 'connected') {
                 systemEvents.push({
                     timestamp: row.timestamp,
                     type: 'warning',
@@ -33,6 +33,7 @@ echo "Installing required packages..."
 apt-get update
 apt-get install -y nginx fcgiwrap ffmpeg
 apt-get install -y imagemagick
+apt-get install -y python3-numpy
 
 # Create required directories
 echo "Creating directories..."
@@ -259,8 +260,14 @@ echo "Creating $TARGET_DIR..."
 mkdir -p "$TARGET_DIR"
 
 # 2. Copy files to /var/lib/pi_monitor
-echo "Copying pi_monitor.py and pi_monitor.service to $TARGET_DIR..."
+echo "Copying pi_monitor.py, its modules and pi_monitor.service to $TARGET_DIR..."
 cp "./pi_monitor.py" "$TARGET_DIR/"
+cp "./pi_logging.py" "$TARGET_DIR/"
+cp "./pi_analytics.py" "$TARGET_DIR/"
+cp "./pi_shipper.py" "$TARGET_DIR/"
+cp "./pi_history.py" "$TARGET_DIR/"
+cp "./pi_replay.py" "$TARGET_DIR/"
+cp "./pi_export.py" "$TARGET_DIR/"
 cp "./pi_monitor.service" "$TARGET_DIR/"
 
 # 3. Copy pi_monitor.py to /usr/local/bin
@@ -268,6 +275,15 @@ echo "Copying pi_monitor.py to /usr/local/bin..."
 cp "./pi_monitor.py" /usr/local/bin/pi_monitor.py
 chmod +x /usr/local/bin/pi_monitor.py
 
+# The pi_*.py modules are imported by pi_monitor.py, so they must sit next to it
+cp "./pi_logging.py" /usr/local/bin/pi_logging.py
+cp "./pi_analytics.py" /usr/local/bin/pi_analytics.py
+cp "./pi_shipper.py" /usr/local/bin/pi_shipper.py
+cp "./pi_history.py" /usr/local/bin/pi_history.py
+cp "./pi_replay.py" /usr/local/bin/pi_replay.py
+cp "./pi_export.py" /usr/local/bin/pi_export.py
+chmod +x /usr/local/bin/pi_analytics.py /usr/local/bin/pi_shipper.py /usr/local/bin/pi_export.py
+
 # 4. Copy pi_monitor.service to systemd
 echo "Copying pi_monitor.service to /etc/systemd/system/..."
 cp "./pi_monitor.service" /etc/systemd/system/pi_monitor.service